@@ -0,0 +1,135 @@
+"""
+Long-lived analysis worker used by server.js instead of one Python process per request.
+
+Protocol (line-delimited JSON over stdin/stdout):
+    request:  {"id": 1, "method": "generate_report", "params": {"file_path": "..."}}
+    response: {"id": 1, "result": {...}}  or  {"id": 1, "error": "message"}
+
+Streaming methods first send any number of {"id": 1, "partial": record} lines,
+one per record as soon as it is ready, and then the usual result or error line.
+
+Requests are handled one at a time; server.js runs several workers for parallel
+requests. Because the process stays up, imports, the pooled OCI session and the
+LLM response cache are loaded once and stay warm. The worker also keeps one k-NN
+index for its lifetime; it is reloaded only after another worker saves new rows. Anything the
+analysis code prints goes to stderr so stdout only ever carries responses.
+"""
+import contextlib
+import inspect
+import json
+import os
+import sys
+import traceback
+
+# Add the current directory to the path to make local imports work
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# Keep the real stdout for responses before any module gets a chance to print to it
+_responses = sys.stdout
+
+with contextlib.redirect_stdout(sys.stderr):
+    import analyze_complaints
+    import analyze_complaints_secondstage
+    import analyze_sentiment
+    import enhanced_complaint_classifier
+    from utils import knn_classifier
+
+# Labeled complaint vectors, kept for the life of the worker
+knn_index = knn_classifier.get_index()
+
+
+def generate_report(file_path=None, refresh=False):
+    return analyze_complaints.generate_report(file_path, refresh=refresh)
+
+
+def generate_report_stream(file_path=None, refresh=False):
+    return analyze_complaints.generate_report_stream(file_path, refresh=refresh)
+
+
+def classify_complaints():
+    return analyze_complaints_secondstage.classify_complaints()
+
+
+def classify_with_taxonomy(rebuild_taxonomy=False):
+    """
+    Classify with the stored taxonomy and k-NN index; if that fails (e.g. no
+    OCI_API_KEY to create categories), use the single-prompt second stage, which
+    has a keyword fallback
+    """
+    result = enhanced_complaint_classifier.classify_complaints(rebuild_taxonomy=rebuild_taxonomy, index=knn_index)
+    if "error" in result:
+        print(f"Taxonomy classification failed ({result['error']}), using the second stage", file=sys.stderr)
+        return analyze_complaints_secondstage.classify_complaints()
+    return result
+
+
+def run_sentiment(text, model_name="cohere_oci"):
+    return analyze_sentiment.analyze_sentiment(text, model_name)
+
+
+def resolution_times(classified=False):
+    classified_complaints = None
+    if classified:
+        classified_complaints = classify_with_taxonomy().get("classified_complaints")
+    return analyze_complaints.resolution_times(classified_complaints=classified_complaints)
+
+
+METHODS = {
+    "generate_report": generate_report,
+    "generate_report_stream": generate_report_stream,
+    "classify_complaints": classify_complaints,
+    "classify_with_taxonomy": classify_with_taxonomy,
+    "analyze_sentiment": run_sentiment,
+    "resolution_times": resolution_times,
+}
+
+
+def handle(request):
+    """Run one request and build its response object"""
+    request_id = request.get("id")
+    method = METHODS.get(request.get("method"))
+    if method is None:
+        return {"id": request_id, "error": f"Unknown method: {request.get('method')}"}
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = method(**(request.get("params") or {}))
+        if inspect.isgenerator(result):
+            result = drain(request_id, result)
+        return {"id": request_id, "result": result}
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return {"id": request_id, "error": str(e)}
+
+
+def drain(request_id, generator):
+    """Send each yielded record as a partial response; return the generator's return value"""
+    while True:
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                partial = next(generator)
+        except StopIteration as stop:
+            return stop.value
+        respond({"id": request_id, "partial": partial})
+
+
+def respond(response):
+    _responses.write(json.dumps(response) + "\n")
+    _responses.flush()
+
+
+def main():
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            respond({"id": None, "error": f"Invalid request: {e}"})
+            continue
+        respond(handle(request))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+const { PythonShell } = require('python-shell');
+
+/**
+ * Pool of long-lived analysis_worker.py processes.
+ *
+ * Each worker handles one request at a time over line-delimited JSON, so N workers
+ * serve N requests in parallel while keeping imports, connections and caches warm.
+ * Requests go to the worker with the fewest requests in flight; a worker that exits
+ * fails its pending requests and is replaced.
+ *
+ * Replacements back off exponentially (restartDelay, doubling up to maxRestartDelay)
+ * and a slot whose worker exits maxRestarts times in a row without answering a
+ * request is given up, so a worker that fails at import doesn't respawn in a loop.
+ * Calls made while no worker is running wait for the next one to start, and fail
+ * once every slot has been given up.
+ */
+class AnalysisWorkerPool {
+  constructor(size = 2, { maxRestarts = 5, restartDelay = 500, maxRestartDelay = 30000 } = {}) {
+    this.size = size;
+    this.maxRestarts = maxRestarts;
+    this.restartDelay = restartDelay;
+    this.maxRestartDelay = maxRestartDelay;
+    this.nextId = 1;
+    this.workers = [];
+    this.waiting = [];
+    this.failedSlots = 0;
+    this.restartTimers = new Set();
+    for (let i = 0; i < size; i++) {
+      this.workers.push(this.spawn(i, 0));
+    }
+  }
+
+  spawn(slot, restarts) {
+    const worker = { pending: new Map(), restarts };
+    worker.shell = new PythonShell('analysis_worker.py', {
+      mode: 'json',
+      pythonPath: process.env.PYTHON_PATH || 'python', // or 'python3' depending on your environment
+      pythonOptions: ['-u'], // unbuffered output
+      scriptPath: __dirname
+    });
+
+    worker.shell.on('message', message => {
+      // A worker that answers has started properly
+      worker.restarts = 0;
+      const request = worker.pending.get(message.id);
+      if (!request) {
+        console.error('Analysis worker sent a response for an unknown request:', message);
+        return;
+      }
+      if (message.partial !== undefined) {
+        // Streaming methods report each record before the final result
+        if (request.onPartial) {
+          request.onPartial(message.partial);
+        }
+        return;
+      }
+      worker.pending.delete(message.id);
+      if (message.error !== undefined) {
+        request.reject(new Error(message.error));
+      } else {
+        request.resolve(message.result);
+      }
+    });
+
+    // Analysis logs are written to stderr by the worker
+    worker.shell.on('stderr', line => console.error(`[analysis worker] ${line}`));
+
+    const replace = err => {
+      if (worker.closed) {
+        return;
+      }
+      worker.closed = true;
+      const exitCode = worker.shell.exitCode;
+      const reason = err
+        ? err.message
+        : `exited${exitCode !== null && exitCode !== undefined ? ` with code ${exitCode}` : ''}`;
+      for (const request of worker.pending.values()) {
+        request.reject(new Error(`Analysis worker ${reason} before answering`));
+      }
+      worker.pending.clear();
+      if (this.shuttingDown || this.workers[slot] !== worker) {
+        return;
+      }
+      this.workers[slot] = null;
+
+      if (worker.restarts >= this.maxRestarts) {
+        console.error(`Analysis worker ${slot} ${reason}; giving up after ${worker.restarts} restarts`);
+        this.failedSlots++;
+        if (this.failedSlots === this.size) {
+          this.rejectWaiting(new Error(
+            `All analysis workers failed to start (last: ${reason}); see the [analysis worker] logs`
+          ));
+        }
+        return;
+      }
+      const delay = Math.min(this.restartDelay * 2 ** worker.restarts, this.maxRestartDelay);
+      console.error(`Analysis worker ${slot} ${reason}; restarting in ${delay} ms`);
+      const timer = setTimeout(() => {
+        this.restartTimers.delete(timer);
+        this.workers[slot] = this.spawn(slot, worker.restarts + 1);
+        this.dispatchWaiting();
+      }, delay);
+      this.restartTimers.add(timer);
+    };
+    worker.shell.on('error', replace);
+    worker.shell.on('pythonError', replace);
+    worker.shell.on('close', () => replace());
+    // Writing a request to a worker that already died fails with EPIPE
+    worker.shell.stdin.on('error', replace);
+
+    return worker;
+  }
+
+  /**
+   * Calls a worker method and resolves with its result.
+   * @param {string} method - generate_report, generate_report_stream, classify_complaints,
+   *                          classify_with_taxonomy, analyze_sentiment or resolution_times
+   * @param {Object} params - Keyword arguments for the method
+   * @param {Function} [onPartial] - Called with each record a streaming method sends
+   * @returns {Promise<any>}
+   */
+  call(method, params = {}, onPartial = null) {
+    return new Promise((resolve, reject) => {
+      if (this.failedSlots === this.size) {
+        reject(new Error('No analysis worker is running; see the [analysis worker] logs'));
+        return;
+      }
+      this.waiting.push({ method, params, resolve, reject, onPartial });
+      this.dispatchWaiting();
+    });
+  }
+
+  dispatchWaiting() {
+    const running = this.workers.filter(worker => worker !== null);
+    if (!running.length) {
+      return;
+    }
+    for (const request of this.waiting.splice(0)) {
+      const worker = running.reduce((best, candidate) =>
+        candidate.pending.size < best.pending.size ? candidate : best
+      );
+      const id = this.nextId++;
+      worker.pending.set(id, request);
+      worker.shell.send({ id, method: request.method, params: request.params });
+    }
+  }
+
+  rejectWaiting(err) {
+    for (const request of this.waiting.splice(0)) {
+      request.reject(err);
+    }
+  }
+
+  close() {
+    this.shuttingDown = true;
+    for (const timer of this.restartTimers) {
+      clearTimeout(timer);
+    }
+    this.restartTimers.clear();
+    this.rejectWaiting(new Error('Analysis worker pool closed'));
+    for (const worker of this.workers) {
+      if (worker !== null) {
+        worker.shell.end(() => {});
+      }
+    }
+  }
+}
+
+let defaultPool = null;
+
+/**
+ * Shared pool sized by the ANALYSIS_WORKERS environment variable (default 2).
+ */
+function getWorkerPool() {
+  if (!defaultPool) {
+    defaultPool = new AnalysisWorkerPool(parseInt(process.env.ANALYSIS_WORKERS, 10) || 2);
+  }
+  return defaultPool;
+}
+
+module.exports = { AnalysisWorkerPool, getWorkerPool };
@@ -2,7 +2,6 @@
 import json
 import sys
 import os
-import requests
 from datetime import datetime
 
 # Add the current directory to the path to make local imports work
@@ -39,7 +38,6 @@ except ImportError as e:
        - 4-5: Somewhat negative (customer has concerns or mild frustration)
        - 6-7: Neutral to slightly positive (customer is calm or satisfied with resolution)
        - 8-10: Very positive (customer is happy, grateful, or impressed)
-    4. Include the date and time created and date and time ended for each complaint
     
     IMPORTANT: Do NOT default to a neutral score of 5. Analyze the actual sentiment in the dialog.
     
@@ -48,47 +46,56 @@ except ImportError as e:
       {
         "id": "1",
         "summary": "Customer's fridge is not cooling properly and needs warranty service.",
-        "sentiment_score": 3,
-        "date_created": "2023-01-10",
-        "time_created": "9:30 AM",
-        "date_ended": "2023-01-10",
-        "time_ended": "9:45 AM"
+        "sentiment_score": 3
       },
       ... and so on for each complaint
     ]"""
         return ""
 
-def generate_report(file_path=None):
+# Required modules, which have no fallback definitions
+from utils import complaint_reader, complaint_times, dedup, id_join, json_salvage, oci_client, stage_artifacts
+
+# Stage name of the stored first-stage reports (see utils/stage_artifacts.py)
+FIRST_STAGE = "first_stage"
+
+def generate_report(file_path=None, refresh=False):
     """
     Generate a report of analyzed complaints with sentiment scores using OCI AI.
     Returns data in the specified format.
+
+    Model-generated reports are stored as first-stage artifacts keyed by a hash of
+    the complaints, so the same dataset is only analyzed once; the second stage
+    reads them through this function as well.
     
     Args:
-        file_path (str, optional): Path to a custom complaints JSON file. 
-                                  If None, uses default sources.
+        file_path (str, optional): Path to a custom complaints file (JSON,
+                                  JSONL, CSV or Parquet). If None, uses default sources.
+        refresh (bool, optional): Ignore a stored artifact and analyze again.
     """
     try:
-        # Try to use the provided file path first
-        if file_path and os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                complaints = json.load(f)
-        else:
-            # Otherwise, try JSONBin.io first, then fall back to local file
-            try:
-                complaints = fetch_complaints()
-            except Exception as e:
-                print(f"Error fetching from JSONBin.io: {str(e)}", file=sys.stderr)
-                print("Falling back to local file...", file=sys.stderr)
-                # Fallback to local file if JSONBin.io fails
-                complaints_path = os.path.join(os.path.dirname(__file__), 'ComplainsList.json')
-                with open(complaints_path, 'r', encoding='utf-8') as f:
-                    complaints = json.load(f)
+        complaints = load_complaints(file_path)
+
+        digest = first_stage_digest(complaints)
+        if not refresh:
+            cached = stage_artifacts.load(FIRST_STAGE, digest)
+            if cached is not None:
+                print(f"Using stored first-stage analysis {digest[:12]}", file=sys.stderr)
+                return cached
         
-        # Format complaints for the AI model
+        # Format complaints for the AI model (one representative per near-duplicate group)
+        mark_duplicates(complaints)
         formatted_complaints = format_complaints_for_ai(complaints)
         
         # Use OCI AI to analyze the complaints
-        analyzed_complaints = analyze_with_oci_ai(formatted_complaints)
+        analyzed_complaints, from_model = analyze_with_oci_ai(formatted_complaints)
+        
+        # Give every near-duplicate a copy of its representative's analysis
+        analyzed_complaints = dedup.fan_out(
+            analyzed_complaints,
+            complaints,
+            id_key="DialogID",
+            own_fields=own_complaint_fields
+        )
         
         # Format the response as requested
         response = {
@@ -96,6 +103,10 @@ def generate_report(file_path=None):
                 "reports": [analyzed_complaints]
             }
         }
+
+        # Fallback results are not stored so the next request retries the model
+        if from_model:
+            stage_artifacts.save(FIRST_STAGE, digest, response)
         
         return response
         
@@ -103,57 +114,242 @@ def generate_report(file_path=None):
         print(f"Error: {str(e)}", file=sys.stderr)
         return {"error": f"Failed to process complaints: {str(e)}"}
 
+def generate_report_stream(file_path=None, refresh=False):
+    """
+    Streaming variant of generate_report.
+
+    Yields each analyzed complaint (and copies for its near-duplicates) as soon as
+    the model has finished writing it, then returns the same response dict that
+    generate_report would, as the generator's return value. Stored artifacts and
+    the fallback analysis are replayed record by record.
+    """
+    try:
+        complaints = load_complaints(file_path)
+        digest = first_stage_digest(complaints)
+
+        response = None if refresh else stage_artifacts.load(FIRST_STAGE, digest)
+        if response is None and os.environ.get('OCI_API_KEY'):
+            return (yield from stream_with_oci_ai(complaints, digest))
+        if response is None:
+            response = generate_report(file_path, refresh=refresh)
+        for record in response.get("generate_report", {}).get("reports", [[]])[0]:
+            yield record
+        return response
+
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return {"error": f"Failed to process complaints: {str(e)}"}
+
+def stream_with_oci_ai(complaints, digest):
+    """
+    Stream the first-stage analysis from OCI AI, yielding records as they complete.
+
+    Representatives the stream did not deliver (malformed or truncated output, or
+    a dropped connection) are analyzed again with one non-streaming request.
+    """
+    mark_duplicates(complaints)
+    complaints_text, representatives = format_complaints_for_ai(complaints)
+    model_config = MODEL_REGISTRY["cohere_oci"]
+    payload = first_stage_payload(model_config, complaints_text)
+
+    by_id = id_join.index(complaints, "DialogID")
+    duplicates = {}
+    for complaint in complaints:
+        if "duplicate_of" in complaint:
+            duplicates.setdefault(str(complaint["duplicate_of"]), []).append(complaint)
+
+    def expand(records):
+        """The records plus near-duplicate copies, for the complaints they belong to"""
+        group = []
+        for record in records:
+            original = by_id.get(str(record.get("id")))
+            if original is not None and "duplicate_of" not in original:
+                group.append(original)
+                group.extend(duplicates.get(str(original["DialogID"]), []))
+        return dedup.fan_out(records, group, id_key="DialogID", own_fields=own_complaint_fields)
+
+    # Only the representatives were sent; other ids, and repeats, are dropped
+    requested = {str(complaint["DialogID"]) for complaint in representatives}
+    received = set()
+    analyzed = []
+    parser = json_salvage.ArrayStream()
+    try:
+        for piece in oci_client.stream_inference(model_config, payload, os.environ['OCI_API_KEY'], timeout=120):
+            for record in parser.feed(piece):
+                if not isinstance(record, dict) or "id" not in record:
+                    continue
+                key = str(record["id"])
+                if key not in requested or key in received:
+                    continue
+                received.add(key)
+                try:
+                    record["id"] = int(record["id"])
+                except (TypeError, ValueError):
+                    # Keep as string if conversion fails
+                    pass
+                record.update(own_complaint_fields(by_id[key]))
+                analyzed.append(record)
+                yield from expand([record])
+    except Exception as e:
+        print(f"Error streaming from OCI AI: {str(e)}", file=sys.stderr)
+
+    from_model = True
+    missing = [complaint for complaint in representatives if str(complaint["DialogID"]) not in received]
+    if missing:
+        print(f"Stream did not deliver {len(missing)} complaints, requesting them again", file=sys.stderr)
+        retried, from_model = analyze_with_oci_ai(format_complaints_for_ai(missing))
+        retried = [record for record in retried if str(record.get("id")) not in received]
+        received.update(str(record.get("id")) for record in retried)
+        analyzed.extend(retried)
+        yield from expand(retried)
+
+    response = {
+        "generate_report": {
+            "reports": [dedup.fan_out(analyzed, complaints, id_key="DialogID", own_fields=own_complaint_fields)]
+        }
+    }
+    # Fallback results are not stored so the next request retries the model
+    if from_model:
+        stage_artifacts.save(FIRST_STAGE, digest, response)
+    return response
+
+def first_stage_digest(complaints):
+    """Artifact key of the first-stage report: the complaints, the model and the prompt"""
+    model_config = MODEL_REGISTRY["cohere_oci"]
+    return stage_artifacts.dataset_hash(
+        complaints, model_config["model_id"], get_prompt("cohere_oci", "summarization")
+    )
+
+def first_stage_payload(model_config, complaints_text):
+    """Inference request body for the first-stage analysis"""
+    return {
+        "prompt": get_prompt("cohere_oci", "summarization"),
+        "inputs": [complaints_text],
+        "temperature": model_config["model_kwargs"]["temperature"],
+        "max_tokens": model_config["model_kwargs"]["max_tokens"]
+    }
+
+def load_complaints(file_path=None):
+    """
+    Read complaints from file_path if given, otherwise JSONBin.io with the local file as fallback
+
+    Files may be JSON, JSONL, CSV or Parquet exports; they are parsed record by
+    record by complaint_reader and every source is normalized to the same fields.
+    Each complaint also gets its handling time as "HandlingMinutes", from one
+    vectorized pass over the date and time fields.
+    """
+    # Try to use the provided file path first
+    if file_path and os.path.exists(file_path):
+        return add_handling_minutes(list(complaint_reader.iter_complaints(file_path)))
+
+    # Otherwise, try JSONBin.io first, then fall back to local file
+    try:
+        complaints = fetch_complaints()
+        complaints = [record for record in map(complaint_reader.normalize, complaints) if record is not None]
+    except Exception as e:
+        print(f"Error fetching from JSONBin.io: {str(e)}", file=sys.stderr)
+        print("Falling back to local file...", file=sys.stderr)
+        # Fallback to local file if JSONBin.io fails
+        complaints_path = os.path.join(os.path.dirname(__file__), 'ComplainsList.json')
+        complaints = list(complaint_reader.iter_complaints(complaints_path))
+    return add_handling_minutes(complaints)
+
+def add_handling_minutes(complaints):
+    """Set "HandlingMinutes" on each complaint (None when a start or end time is missing)"""
+    times = complaint_times.ComplaintTimes.from_records(complaints)
+    for complaint in complaints:
+        complaint["HandlingMinutes"] = times.handling_minutes(complaint["DialogID"])
+    return complaints
+
+def resolution_times(file_path=None, classified_complaints=None):
+    """
+    Complaints and handling minutes per day created, and per complaint_type when
+    classified complaints (e.g. from the second stage) are given. Computed
+    locally from the complaint dates; no model call is made.
+    """
+    times = complaint_times.ComplaintTimes.from_records(load_complaints(file_path))
+    result = {"daily": times.daily()}
+    if classified_complaints:
+        typed = [complaint for complaint in classified_complaints if "complaint_type" in complaint]
+        result["by_category"] = times.by_category(
+            [complaint.get("id") for complaint in typed],
+            [complaint["complaint_type"] for complaint in typed],
+        )
+    return result
+
+def mark_duplicates(complaints, dedup_threshold=dedup.DEFAULT_THRESHOLD):
+    """
+    Mark near-duplicate dialogs with "duplicate_of" (the DialogID of their group's
+    representative). Done once per run on the full set: marking a subset again,
+    e.g. the complaints re-requested after a partial answer, would point its
+    duplicates at representatives outside it.
+    """
+    return dedup.mark_duplicates(complaints, "CustomerComplaintDialog", id_key="DialogID", threshold=dedup_threshold)
+
 def format_complaints_for_ai(complaints):
-    """Format the complaints data for sending to the AI model"""
+    """
+    Format the complaints data for sending to the AI model
+
+    Complaints marked by mark_duplicates as near-duplicates are left out of the
+    text, so only one representative per group is analyzed.
+    """
+    representatives = dedup.representatives(complaints)
+    
     formatted_text = "Customer Complaints to Analyze:\n\n"
     
-    for complaint in complaints:
+    for complaint in representatives:
+        # Dates and times are joined back in locally (own_complaint_fields), not sent
         formatted_text += f"Complaint ID: {complaint['DialogID']}\n"
-        formatted_text += f"Date Created: {complaint['DateCreated']}\n"
-        formatted_text += f"Time Created: {complaint['Date&TimeCreated']}\n"
-        formatted_text += f"Date Ended: {complaint['DateEnded']}\n"
-        formatted_text += f"Time Ended: {complaint['Date&TimeEnded']}\n"
         formatted_text += f"Dialog: {complaint['CustomerComplaintDialog']}\n\n"
     
-    return formatted_text, complaints  # Return the original complaints as well
+    return formatted_text, representatives  # Return the analyzed complaints as well
+
+def own_complaint_fields(complaint):
+    """
+    Fields every analyzed record takes from its own complaint rather than the model
+    (or, for a near-duplicate, its representative)
+    """
+    return {
+        "date_created": complaint.get("DateCreated", ""),
+        "time_created": complaint.get("Date&TimeCreated", ""),
+        "date_ended": complaint.get("DateEnded", ""),
+        "time_ended": complaint.get("Date&TimeEnded", ""),
+        "handling_minutes": complaint.get("HandlingMinutes"),
+        "original_dialog": complaint.get("CustomerComplaintDialog", "")
+    }
 
-def analyze_with_oci_ai(complaints_data):
+def analyze_with_oci_ai(complaints_data, retry_missing=True):
     """
     Use OCI AI to analyze the complaints
+
+    The analyzed records are joined to the complaints by DialogID. Complaints the
+    model left out are requested once more on their own (if retry_missing), and
+    records for ids that were not sent are dropped.
+
+    Returns:
+        tuple: (analyzed complaints, True if they came from the model rather than
+               the keyword-based fallback analysis)
     """
     complaints_text, original_complaints = complaints_data
     # Use Cohere model by default
     model_name = "cohere_oci"
     model_config = MODEL_REGISTRY[model_name]
     
-    # Get the prompt for summarization
-    prompt = get_prompt(model_name, "summarization")
-    
     # Check if API key is available
     api_key = os.environ.get('OCI_API_KEY')
     if not api_key:
         print("Warning: OCI_API_KEY environment variable not set. Using fallback analysis.", file=sys.stderr)
-        return fallback_analysis(complaints_data)
+        return fallback_analysis(complaints_data), False
     
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    payload = {
-        "prompt": prompt,
-        "inputs": [complaints_text],
-        "temperature": model_config["model_kwargs"]["temperature"],
-        "max_tokens": model_config["model_kwargs"]["max_tokens"]
-    }
+    payload = first_stage_payload(model_config, complaints_text)
     
     # Make the API request to OCI AI
     try:
-        response = requests.post(
-            f"{model_config['service_endpoint']}/inference/{model_config['model_id']}",
-            headers=headers,
-            json=payload
+        response = oci_client.post_inference(
+            model_config,
+            payload,
+            api_key,
+            timeout=120
         )
         
         if response.status_code == 200:
@@ -163,39 +359,50 @@ def analyze_with_oci_ai(complaints_data):
             
             try:
                 # The AI should return a JSON string, parse it
-                analyzed_complaints = json.loads(ai_response)
+                analyzed_complaints = json_salvage.loads(ai_response)
                 
                 # Ensure all IDs are integers to match the expected format
-                for i, complaint in enumerate(analyzed_complaints):
-                    if "id" in complaint and isinstance(complaint["id"], str):
+                for complaint in analyzed_complaints if isinstance(analyzed_complaints, list) else []:
+                    if isinstance(complaint, dict) and isinstance(complaint.get("id"), str):
                         try:
                             complaint["id"] = int(complaint["id"])
                         except ValueError:
                             # Keep as string if conversion fails
                             pass
-                    
-                    # Add the original dialog from the original complaints data
-                    complaint_id = complaint.get("id")
-                    # Find the matching original complaint
-                    for orig_complaint in original_complaints:
-                        if str(orig_complaint.get("DialogID")) == str(complaint_id) or i < len(original_complaints):
-                            # Add the original dialog to the analyzed complaint
-                            complaint["original_dialog"] = orig_complaint.get("CustomerComplaintDialog", "")
-                            break
-                
-                return analyzed_complaints
+
+                # Add the dates and original dialog from the complaint with the same id
+                pairs, report = id_join.join(original_complaints, analyzed_complaints, source_key="DialogID")
+                if id_join.describe(report):
+                    print(f"Analysis join: {id_join.describe(report)}", file=sys.stderr)
+                if not pairs:
+                    raise json.JSONDecodeError("No analyzed complaint matches a requested id", ai_response, 0)
+                analyzed_complaints = []
+                for original, complaint in pairs:
+                    complaint.update(own_complaint_fields(original))
+                    analyzed_complaints.append(complaint)
+
+                if report["missing"] and retry_missing:
+                    missing = {str(dialog_id) for dialog_id in report["missing"]}
+                    retry = [complaint for complaint in original_complaints if str(complaint["DialogID"]) in missing]
+                    print(f"Requesting {len(retry)} missing complaints again", file=sys.stderr)
+                    retried, from_model = analyze_with_oci_ai(format_complaints_for_ai(retry), retry_missing=False)
+                    if from_model:
+                        analyzed_complaints.extend(retried)
+
+                return analyzed_complaints, True
             except json.JSONDecodeError as e:
                 print(f"Error parsing AI response: {e}", file=sys.stderr)
                 print(f"Raw AI response: {ai_response}", file=sys.stderr)
-                return fallback_analysis(complaints_data)
+                oci_client.forget(model_config, payload)
+                return fallback_analysis(complaints_data), False
         else:
             print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
             # Fallback to simple analysis if API fails
-            return fallback_analysis(complaints_data)
+            return fallback_analysis(complaints_data), False
     except Exception as e:
         print(f"Error calling OCI AI: {str(e)}", file=sys.stderr)
         # Fallback to simple analysis if API fails
-        return fallback_analysis(complaints_data)
+        return fallback_analysis(complaints_data), False
 
 def fallback_analysis(complaints_data):
     """Fallback method if the API call fails"""
@@ -212,24 +419,12 @@ def fallback_analysis(complaints_data):
     
     complaints = []
     complaint_blocks = re.split(r'Complaint ID:', complaints_text)[1:]
+    originals = id_join.index(original_complaints, "DialogID")
     
     for i, block in enumerate(complaint_blocks):
         lines = block.strip().split('\n')
         complaint_id = lines[0].strip()
         
-        # Extract dates and times
-        date_created = re.search(r'Date Created: (.*)', block)
-        date_created = date_created.group(1) if date_created else ""
-        
-        time_created = re.search(r'Time Created: (.*)', block)
-        time_created = time_created.group(1) if time_created else ""
-        
-        date_ended = re.search(r'Date Ended: (.*)', block)
-        date_ended = date_ended.group(1) if date_ended else ""
-        
-        time_ended = re.search(r'Time Ended: (.*)', block)
-        time_ended = time_ended.group(1) if time_ended else ""
-        
         # Extract dialog
         dialog = re.search(r'Dialog: (.*)', block, re.DOTALL)
         dialog_text = dialog.group(1).strip() if dialog else ""
@@ -249,21 +444,14 @@ def fallback_analysis(complaints_data):
         except ValueError:
             complaint_id_int = i + 1  # Fallback to index + 1
         
-        # Add the original dialog
-        original_dialog = ""
-        if i < len(original_complaints):
-            original_dialog = original_complaints[i].get("CustomerComplaintDialog", "")
-        
-        complaints.append({
+        # Add the dates and original dialog from the complaint with this id
+        complaint = {
             "id": complaint_id_int,
             "summary": summary,
-            "sentiment_score": sentiment_score,
-            "date_created": date_created,
-            "time_created": time_created,
-            "date_ended": date_ended,
-            "time_ended": time_ended,
-            "original_dialog": original_dialog
-        })
+            "sentiment_score": sentiment_score
+        }
+        complaint.update(own_complaint_fields(originals.get(str(complaint_id_int), {})))
+        complaints.append(complaint)
     
     return complaints
 
@@ -321,7 +509,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Analyze customer complaints for sentiment')
     parser.add_argument('--text', help='Text to analyze')
     parser.add_argument('--model_name', default='cohere_oci', help='Model name to use')
-    parser.add_argument('--file', help='Path to a custom complaints JSON file')
+    parser.add_argument('--file', help="Path to a custom complaints file (JSON, JSONL, CSV or Parquet)")
+    parser.add_argument('--refresh', action='store_true', help='Ignore the stored first-stage analysis')
     
     args = parser.parse_args()
     
@@ -331,6 +520,6 @@ if __name__ == "__main__":
         pass
     else:
         # Generate report from complaints data
-        result = generate_report(args.file)
+        result = generate_report(args.file, refresh=args.refresh)
         print(json.dumps(result))
   
\ No newline at end of file
@@ -1,13 +1,13 @@
 import json
 import sys
 import os
-import requests
 from datetime import datetime
 
 # Add the current directory to the path to make local imports work
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
+import analyze_complaints
 # Import from local utils directory
 try:
     from utils.llm_configM import MODEL_REGISTRY
@@ -42,6 +42,9 @@ Return your analysis in this EXACT JSON format with 8 categories and all complai
         }
     }
 
+# Required modules, which have no fallback definitions
+from utils import id_join, json_salvage, oci_client
+
 def get_prompt(model_name, prompt_type):
     """Get the appropriate prompt for the model and prompt type"""
     if model_name not in PROMPT_SETS:
@@ -60,15 +63,12 @@ def classify_complaints():
     Returns data with complaint types added.
     """
     try:
-        # Fetch the analyzed complaints from the first stage endpoint
-        first_stage_url = "http://localhost:5000/api/analyze-complaints"
-        
+        # Read the first-stage analysis in-process; it is only computed when no
+        # stored artifact exists for the current complaints
         try:
-            response = requests.get(first_stage_url)
-            if response.status_code != 200:
-                raise Exception(f"Failed to fetch data from first stage: {response.status_code}")
-            
-            first_stage_data = response.json()
+            first_stage_data = analyze_complaints.generate_report()
+            if "error" in first_stage_data:
+                raise Exception(first_stage_data["error"])
             
             # Extract the complaints from the first stage data
             if "generate_report" in first_stage_data and "reports" in first_stage_data["generate_report"]:
@@ -95,8 +95,13 @@ def classify_with_oci_ai(complaints):
     """
     Use OCI AI to classify the complaints into categories
     """
-    # Format complaints for the AI model
-    formatted_complaints = json.dumps(complaints, indent=2)
+    # Format complaints for the AI model; dates and handling times are not needed
+    # to classify and are joined back in by id afterwards (rejoin_local_fields)
+    formatted_complaints = json.dumps(
+        [{key: value for key, value in complaint.items() if key not in LOCAL_FIELDS}
+         for complaint in complaints],
+        indent=2
+    )
     
     # Use Cohere model by default
     model_name = "cohere_oci"
@@ -111,12 +116,6 @@ def classify_with_oci_ai(complaints):
         print("Warning: OCI_API_KEY environment variable not set. Using fallback classification.", file=sys.stderr)
         return fallback_classification(complaints)
     
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "prompt": prompt,
         "inputs": [formatted_complaints],
@@ -126,10 +125,11 @@ def classify_with_oci_ai(complaints):
     
     # Make the API request to OCI AI
     try:
-        response = requests.post(
-            f"{model_config['service_endpoint']}/inference/{model_config['model_id']}",
-            headers=headers,
-            json=payload
+        response = oci_client.post_inference(
+            model_config,
+            payload,
+            api_key,
+            timeout=120
         )
         
         if response.status_code == 200:
@@ -139,11 +139,12 @@ def classify_with_oci_ai(complaints):
             
             try:
                 # The AI should return a JSON string, parse it
-                classified_data = json.loads(ai_response)
-                return classified_data
+                classified_data = json_salvage.loads(ai_response)
+                return rejoin_local_fields(classified_data, complaints)
             except json.JSONDecodeError as e:
                 print(f"Error parsing AI response: {e}", file=sys.stderr)
                 print(f"Raw AI response: {ai_response}", file=sys.stderr)
+                oci_client.forget(model_config, payload)
                 return fallback_classification(complaints)
         else:
             print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
@@ -154,6 +155,21 @@ def classify_with_oci_ai(complaints):
         # Fallback to simple classification if API fails
         return fallback_classification(complaints)
 
+# First-stage fields kept out of the classification prompt
+LOCAL_FIELDS = ("date_created", "time_created", "date_ended", "time_ended", "handling_minutes")
+
+def rejoin_local_fields(classified_data, complaints):
+    """Copy LOCAL_FIELDS from the first-stage complaints onto the classified ones with the same id"""
+    classified = classified_data.get("classified_complaints") if isinstance(classified_data, dict) else None
+    if not isinstance(classified, list):
+        return classified_data
+    pairs, report = id_join.join(complaints, classified)
+    if id_join.describe(report):
+        print(f"Classification join: {id_join.describe(report)}", file=sys.stderr)
+    for complaint, classified_complaint in pairs:
+        classified_complaint.update({key: complaint[key] for key in LOCAL_FIELDS if key in complaint})
+    return classified_data
+
 def fallback_classification(complaints):
     """Fallback method if the API call fails"""
     # Create 8 default categories
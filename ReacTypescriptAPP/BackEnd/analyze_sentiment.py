@@ -2,7 +2,6 @@ import json
 import sys
 import os
 import argparse
-import requests
 from datetime import datetime
 
 # Add the current directory to the path to make local imports work
@@ -26,6 +25,9 @@ except ImportError as e:
         }
     }
 
+# Required modules, which have no fallback definitions
+from utils import json_salvage, oci_client
+
 def analyze_sentiment(text, model_name="cohere_oci"):
     """
     Analyze the sentiment of a text using OCI AI.
@@ -82,12 +84,6 @@ Here is the text to analyze:
         print("Warning: OCI_API_KEY environment variable not set. Using mock AI response.", file=sys.stderr)
         return mock_ai_sentiment_analysis(text)
     
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "prompt": full_prompt,
         "temperature": model_config["model_kwargs"]["temperature"],
@@ -96,10 +92,11 @@ Here is the text to analyze:
     
     # Make the API request to OCI AI
     try:
-        response = requests.post(
-            f"{model_config['service_endpoint']}/inference/{model_config['model_id']}",
-            headers=headers,
-            json=payload
+        response = oci_client.post_inference(
+            model_config,
+            payload,
+            api_key,
+            timeout=30
         )
         
         if response.status_code == 200:
@@ -109,18 +106,12 @@ Here is the text to analyze:
             
             try:
                 # Extract the JSON part from the response
-                import re
-                json_match = re.search(r'({.*})', ai_response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                    sentiment_data = json.loads(json_str)
-                    return sentiment_data
-                else:
-                    print("No JSON found in AI response", file=sys.stderr)
-                    return mock_ai_sentiment_analysis(text)
+                sentiment_data = json_salvage.loads(ai_response)
+                return sentiment_data
             except json.JSONDecodeError as e:
                 print(f"Error parsing AI response: {e}", file=sys.stderr)
                 print(f"Raw AI response: {ai_response}", file=sys.stderr)
+                oci_client.forget(model_config, payload)
                 return mock_ai_sentiment_analysis(text)
         else:
             print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
@@ -1,13 +1,13 @@
 import json
 import sys
 import os
-import requests
 from datetime import datetime
 
 # Add the current directory to the path to make local imports work
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
+import analyze_complaints
 # Import from local utils directory
 try:
     from utils.llm_configM import MODEL_REGISTRY
@@ -45,19 +45,50 @@ Return your analysis in this EXACT JSON format:
 
 1. Use the 8 predefined categories provided
 2. Assign each complaint to exactly one of these 8 categories based on the complaint summary
-3. Return the original data with the new category classification added
+3. Return only the id and the assigned category of each complaint
 
 Categories: {categories}
 
-Return your analysis in this EXACT JSON format with all complaints classified."""
+Return your analysis in this EXACT JSON format with all complaints classified:
+{{"classified_complaints": [{{"id": 1, "complaint_type": "Category"}}]}}"""
+
+    ADDITIONAL_CATEGORIES_PROMPT = """You are an expert complaint classifier for SMEG appliances.
+
+These categories already exist: {categories}
+
+Based on the complaint summaries provided in the input, create EXACTLY {count} more distinct categories. Do not repeat existing categories.
+Return ONLY the new categories in this EXACT JSON format:
+{{"categories": ["New Category 1", "New Category 2"]}}"""
 
     PROMPT_SETS = {
         "cohere_oci": {
             "category_creation": CATEGORY_CREATION_PROMPT,
+            "additional_categories": ADDITIONAL_CATEGORIES_PROMPT,
             "complaint_classification": COMPLAINT_CLASSIFICATION_PROMPT
         }
     }
 
+# Summaries sent to the LLM when deriving the taxonomy
+TAXONOMY_SAMPLE_SIZE = 60
+# Complaints per classification request; small enough that the response never hits max_tokens
+CLASSIFY_BATCH_SIZE = 25
+# Number of categories in the taxonomy
+CATEGORY_COUNT = 8
+
+def classified_complaint_schema(categories):
+    """Schema of one classification record; complaint_type must be one of the categories"""
+    return {
+        "type": "object",
+        "properties": {
+            "id": {"type": ["integer", "string"]},
+            "complaint_type": {"type": "string", "enum": list(categories)}
+        },
+        "required": ["id", "complaint_type"]
+    }
+
+# Required modules, which have no fallback definitions
+from utils import json_salvage, knn_classifier, oci_client, record_schema, taxonomy_store
+
 def get_prompt(model_name, prompt_type):
     """Get the appropriate prompt for the model and prompt type"""
     if model_name not in PROMPT_SETS:
@@ -70,21 +101,23 @@ def get_prompt(model_name, prompt_type):
     
     return model_prompts[prompt_type]
 
-def classify_complaints():
+def classify_complaints(rebuild_taxonomy=False, index=None):
     """
     Fetch the analyzed complaints from the first stage and classify them into categories.
     Returns data with complaint types added.
+
+    Args:
+        rebuild_taxonomy (bool, optional): Generate new categories even if the stored
+                                           taxonomy still fits the complaints.
+        index (KNNIndex, optional): k-NN index to vote with; defaults to the shared one.
     """
     try:
-        # Fetch the analyzed complaints from the first stage endpoint
-        first_stage_url = "http://localhost:5000/api/analyze-complaints"
-        
+        # Read the first-stage analysis in-process; it is only computed when no
+        # stored artifact exists for the current complaints
         try:
-            response = requests.get(first_stage_url)
-            if response.status_code != 200:
-                raise Exception(f"Failed to fetch data from first stage: {response.status_code}")
-            
-            first_stage_data = response.json()
+            first_stage_data = analyze_complaints.generate_report()
+            if "error" in first_stage_data:
+                raise Exception(first_stage_data["error"])
             
             # Extract the complaints from the first stage data
             if "generate_report" in first_stage_data and "reports" in first_stage_data["generate_report"]:
@@ -93,11 +126,11 @@ def classify_complaints():
                 complaints = first_stage_data  # Fallback if structure is different
                 
             # Two-step classification process
-            # Step 1: Create 8 categories based on all complaints
-            categories = create_categories(complaints)
+            # Step 1: Reuse the stored taxonomy, or create 8 categories if it drifted
+            categories = get_taxonomy(complaints, rebuild=rebuild_taxonomy)
             
             # Step 2: Classify each complaint into one of these categories
-            classified_data = classify_complaints_with_categories(complaints, categories)
+            classified_data = classify_complaints_with_categories(complaints, categories, index=index)
             
             # Return the classified data directly to match the expected format
             return classified_data
@@ -111,110 +144,206 @@ def classify_complaints():
         print(f"Error: {str(e)}", file=sys.stderr)
         return {"error": f"Failed to classify complaints: {str(e)}"}
 
+def get_taxonomy(complaints, rebuild=False):
+    """
+    Categories for the complaints, reusing the stored taxonomy version unless a
+    rebuild is requested or too many complaints are new to it
+    """
+    store = taxonomy_store.TaxonomyStore()
+    summarized = [complaint for complaint in complaints if "summary" in complaint]
+
+    current = store.current()
+    if current is not None and not rebuild:
+        drift = taxonomy_store.drift(current, summarized)
+        if drift <= taxonomy_store.DRIFT_THRESHOLD:
+            print(f"Reusing taxonomy v{current['version']} (drift {drift:.2f})", file=sys.stderr)
+            return current["categories"]
+        print(f"Taxonomy v{current['version']} drifted ({drift:.2f}), rebuilding", file=sys.stderr)
+
+    categories = create_categories(complaints)
+    taxonomy = store.save(categories, summarized)
+    print(f"Stored taxonomy v{taxonomy['version']}", file=sys.stderr)
+    return categories
+
+def sample_for_taxonomy(complaints, size=TAXONOMY_SAMPLE_SIZE):
+    """
+    Stratified sample of complaints with a summary: the sentiment bands (1-3, 4-5,
+    6-7, 8-10) are represented in proportion, and each band is sampled evenly
+    across its members so the sample is deterministic for a given dataset
+    """
+    with_summary = [complaint for complaint in complaints if "summary" in complaint]
+    if len(with_summary) <= size:
+        return with_summary
+
+    bands = {}
+    for complaint in with_summary:
+        try:
+            score = float(complaint.get("sentiment_score", 5))
+        except (TypeError, ValueError):
+            score = 5
+        band = 0 if score < 4 else 1 if score < 6 else 2 if score < 8 else 3
+        bands.setdefault(band, []).append(complaint)
+
+    sample = []
+    for members in bands.values():
+        quota = min(len(members), max(1, round(size * len(members) / len(with_summary))))
+        step = len(members) / quota
+        sample.extend(members[int(i * step)] for i in range(quota))
+    return sample
+
 def create_categories(complaints):
     """
     Step 1: Create exactly 8 categories based on all complaint summaries
     This function will retry multiple times to ensure AI generates the categories
+
+    Valid categories from a response are kept; a retry only asks for the number
+    of categories still missing, given the ones already accepted.
     """
-    # Format complaints for the AI model - we only need summaries for category creation
-    summaries = []
-    for complaint in complaints:
-        if "summary" in complaint:
-            summaries.append(complaint["summary"])
+    # Only summaries are needed for category creation, and a stratified sample of
+    # them is enough to cover the complaint types of the whole set
+    summaries = [complaint["summary"] for complaint in sample_for_taxonomy(complaints)]
     
-    formatted_summaries = json.dumps(summaries, indent=2)
+    formatted_summaries = json.dumps(summaries, ensure_ascii=False, separators=(",", ":"))
     
     # Use Cohere model by default
     model_name = "cohere_oci"
     model_config = MODEL_REGISTRY[model_name]
     
-    # Get the prompt for category creation
-    prompt = get_prompt(model_name, "category_creation")
-    
     # Check if API key is available
     api_key = os.environ.get('OCI_API_KEY')
     if not api_key:
         print("Error: OCI_API_KEY environment variable not set.", file=sys.stderr)
         raise Exception("OCI_API_KEY environment variable not set. Cannot generate categories without API access.")
     
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    categories = []
+    seen = set()
     
     # We'll try multiple times with different temperatures if needed
     temperatures = [0.7, 0.5, 0.3, 0.9]
-    max_retries = len(temperatures)
     
     for retry_count, temperature in enumerate(temperatures):
+        missing = CATEGORY_COUNT - len(categories)
+        if categories:
+            prompt = get_prompt(model_name, "additional_categories").format(
+                count=missing, categories=json.dumps(categories)
+            )
+        else:
+            prompt = get_prompt(model_name, "category_creation")
+        payload = {
+            "prompt": prompt,
+            "inputs": [formatted_summaries],
+            "temperature": temperature,
+            "max_tokens": model_config["model_kwargs"]["max_tokens"]
+        }
+        
         try:
-            payload = {
-                "prompt": prompt,
-                "inputs": [formatted_summaries],
-                "temperature": temperature,
-                "max_tokens": model_config["model_kwargs"]["max_tokens"]
-            }
-            
             # Make the API request to OCI AI
-            response = requests.post(
-                f"{model_config['service_endpoint']}/inference/{model_config['model_id']}",
-                headers=headers,
-                json=payload,
-                timeout=30  # Add timeout to prevent hanging
+            response = oci_client.post_inference(
+                model_config,
+                payload,
+                api_key,
+                timeout=30
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # Parse the AI response which should be in JSON format
-                ai_response = result.get("generated_text", "")
-                
-                try:
-                    # The AI should return a JSON string with categories
-                    categories_data = json.loads(ai_response)
-                    
-                    # Validate that we have exactly 8 categories
-                    if "categories" in categories_data and len(categories_data["categories"]) == 8:
-                        print(f"Successfully generated 8 categories on attempt {retry_count+1}", file=sys.stderr)
-                        return categories_data["categories"]
-                    else:
-                        print(f"Attempt {retry_count+1}: AI did not return exactly 8 categories", file=sys.stderr)
-                        # If we have some categories but not 8, and this is our last retry
-                        if "categories" in categories_data and len(categories_data["categories"]) > 0 and retry_count == max_retries - 1:
-                            # Take first 8 or pad to 8 with generic categories
-                            categories = categories_data["categories"][:8]
-                            while len(categories) < 8:
-                                categories.append(f"Category {len(categories)+1}")
-                            return categories
-                except json.JSONDecodeError as e:
-                    print(f"Attempt {retry_count+1}: Error parsing AI response: {e}", file=sys.stderr)
-                    # Try to extract categories from the text if possible
-                    import re
-                    categories = re.findall(r'"([^"]+)"', ai_response)
-                    if len(categories) >= 8 and retry_count == max_retries - 1:
-                        return categories[:8]
-            else:
-                print(f"Attempt {retry_count+1}: API Error: {response.status_code} - {response.text}", file=sys.stderr)
-                
-            # If this was the last retry and we still don't have categories, raise an exception
-            if retry_count == max_retries - 1:
-                raise Exception("Failed to generate categories after multiple attempts")
-                
         except Exception as e:
-            # If this is the last retry, re-raise the exception
-            if retry_count == max_retries - 1:
-                print(f"All attempts to generate categories failed: {str(e)}", file=sys.stderr)
-                raise Exception(f"Failed to generate categories: {str(e)}")
-            else:
-                print(f"Attempt {retry_count+1} failed: {str(e)}. Retrying...", file=sys.stderr)
+            print(f"Attempt {retry_count+1}: Error calling OCI AI: {str(e)}", file=sys.stderr)
+            continue
+        
+        if response.status_code != 200:
+            print(f"Attempt {retry_count+1}: API Error: {response.status_code} - {response.text}", file=sys.stderr)
+            continue
+        
+        # Parse the AI response which should be in JSON format
+        ai_response = response.json().get("generated_text", "")
+        try:
+            proposed = json_salvage.loads(ai_response)["categories"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Attempt {retry_count+1}: Error parsing AI response: {e}", file=sys.stderr)
+            oci_client.forget(model_config, payload)
+            continue
+        
+        # Accept each new, non-empty category name until the taxonomy is complete
+        for category in proposed if isinstance(proposed, list) else []:
+            if not isinstance(category, str) or not category.strip():
+                continue
+            if category.strip().lower() in seen or len(categories) == CATEGORY_COUNT:
+                continue
+            seen.add(category.strip().lower())
+            categories.append(category.strip())
+        
+        if len(categories) == CATEGORY_COUNT:
+            print(f"Successfully generated {CATEGORY_COUNT} categories on attempt {retry_count+1}", file=sys.stderr)
+            return categories
+        print(f"Attempt {retry_count+1}: {len(categories)} of {CATEGORY_COUNT} categories so far", file=sys.stderr)
+    
+    if not categories:
+        print("All attempts to generate categories failed", file=sys.stderr)
+        raise Exception("Failed to generate categories after multiple attempts")
+    
+    # Pad to 8 with generic categories
+    while len(categories) < CATEGORY_COUNT:
+        categories.append(f"Category {len(categories)+1}")
+    return categories
 
-def classify_complaints_with_categories(complaints, categories):
+def classify_complaints_with_categories(complaints, categories, index=None):
     """
     Step 2: Classify each complaint into one of the predefined categories
+
+    Complaints similar enough to previously labeled ones get their type from a
+    local k-NN vote; only the low-margin ones are sent to the LLM, and the LLM's
+    labels are added to the index for next time.
+    """
+    if index is None:
+        index = knn_classifier.get_index()
+    else:
+        index.refresh()
+    predictions = index.classify([complaint.get("summary", "") for complaint in complaints], categories)
+
+    classified = {}
+    uncertain = []
+    for position, (complaint, (label, margin)) in enumerate(zip(complaints, predictions)):
+        if label is not None and margin >= knn_classifier.MIN_MARGIN:
+            complaint_with_type = complaint.copy()
+            complaint_with_type["complaint_type"] = label
+            classified[position] = complaint_with_type
+        else:
+            uncertain.append(position)
+    print(f"k-NN classified {len(classified)} complaints, sending {len(uncertain)} to the LLM", file=sys.stderr)
+
+    extra = []
+    if uncertain:
+        llm_data = classify_with_llm([complaints[i] for i in uncertain], categories)
+        positions = {str(complaints[i].get("id")): i for i in uncertain}
+        learned = []
+        for complaint in llm_data["classified_complaints"]:
+            position = positions.get(str(complaint.get("id")))
+            if position is None:
+                extra.append(complaint)
+                continue
+            classified[position] = complaint
+            if complaint.get("complaint_type") in categories:
+                learned.append(complaint)
+        index.add(
+            [complaint.get("id") for complaint in learned],
+            [complaint.get("summary", "") for complaint in learned],
+            [complaint["complaint_type"] for complaint in learned]
+        )
+        index.save()
+
+    return {
+        "categories": categories,
+        "classified_complaints": [classified[i] for i in sorted(classified)] + extra
+    }
+
+def classify_with_llm(complaints, categories):
+    """
+    Classify complaints into the predefined categories with the LLM
+
+    Complaints go out as compact {"id", "summary"} batches of CLASSIFY_BATCH_SIZE,
+    sent concurrently. Each returned record is validated on its own; valid ones are
+    merged back onto the complaints by id, and only complaints whose record was
+    missing, malformed or named an unknown category are re-requested at the next
+    temperature.
     """
-    # Format complaints for the AI model
-    formatted_complaints = json.dumps(complaints, indent=2)
-    
     # Use Cohere model by default
     model_name = "cohere_oci"
     model_config = MODEL_REGISTRY[model_name]
@@ -229,81 +358,102 @@ def classify_complaints_with_categories(complaints, categories):
         print("Error: OCI_API_KEY environment variable not set.", file=sys.stderr)
         raise Exception("OCI_API_KEY environment variable not set. Cannot classify complaints without API access.")
     
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    schema = classified_complaint_schema(categories)
+    # Tolerate case and spacing differences in the returned category names
+    canonical = {category.strip().lower(): category for category in categories}
+    complaint_types = {}
+    pending = list(complaints)
     
     # We'll try multiple times with different temperatures if needed
     temperatures = [0.7, 0.5, 0.3, 0.9]
-    max_retries = len(temperatures)
     
     for retry_count, temperature in enumerate(temperatures):
-        try:
-            payload = {
+        batches = [
+            pending[start:start + CLASSIFY_BATCH_SIZE]
+            for start in range(0, len(pending), CLASSIFY_BATCH_SIZE)
+        ]
+        payloads = [
+            {
                 "prompt": prompt,
-                "inputs": [formatted_complaints],
+                "inputs": [json.dumps(
+                    [{"id": complaint.get("id"), "summary": complaint.get("summary", "")} for complaint in batch],
+                    ensure_ascii=False,
+                    separators=(",", ":")
+                )],
                 "temperature": temperature,
                 "max_tokens": model_config["model_kwargs"]["max_tokens"]
             }
+            for batch in batches
+        ]
+        
+        # Make the API requests to OCI AI, several batches at a time
+        responses = oci_client.post_inference_many(model_config, payloads, api_key, timeout=30)
+        
+        for batch, payload, response in zip(batches, payloads, responses):
+            if isinstance(response, Exception):
+                print(f"Attempt {retry_count+1}: Error calling OCI AI: {response}", file=sys.stderr)
+                continue
+            if response.status_code != 200:
+                print(f"Attempt {retry_count+1}: API Error: {response.status_code} - {response.text}", file=sys.stderr)
+                continue
             
-            # Make the API request to OCI AI
-            response = requests.post(
-                f"{model_config['service_endpoint']}/inference/{model_config['model_id']}",
-                headers=headers,
-                json=payload,
-                timeout=30  # Add timeout to prevent hanging
-            )
+            # Parse the AI response which should be in JSON format
+            ai_response = response.json().get("generated_text", "")
+            try:
+                records = json_salvage.loads(ai_response)["classified_complaints"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                print(f"Attempt {retry_count+1}: Error parsing AI response: {e}", file=sys.stderr)
+                oci_client.forget(model_config, payload)
+                continue
             
-            if response.status_code == 200:
-                result = response.json()
-                # Parse the AI response which should be in JSON format
-                ai_response = result.get("generated_text", "")
-                
-                try:
-                    # The AI should return a JSON string with classified complaints
-                    classified_data = json.loads(ai_response)
-                    
-                    # Ensure all complaints have a classification
-                    if "classified_complaints" in classified_data:
-                        # Validate that all complaints have a complaint_type
-                        for complaint in classified_data["classified_complaints"]:
-                            if "complaint_type" not in complaint:
-                                # Assign a default category from our list
-                                complaint["complaint_type"] = categories[0]
-                        
-                        # Ensure the categories field is present
-                        if "categories" not in classified_data:
-                            classified_data["categories"] = categories
-                        
-                        print(f"Successfully classified complaints on attempt {retry_count+1}", file=sys.stderr)
-                        return classified_data
-                    else:
-                        print(f"Attempt {retry_count+1}: AI response missing classified_complaints", file=sys.stderr)
-                except json.JSONDecodeError as e:
-                    print(f"Attempt {retry_count+1}: Error parsing AI response: {e}", file=sys.stderr)
-            else:
-                print(f"Attempt {retry_count+1}: API Error: {response.status_code} - {response.text}", file=sys.stderr)
-                
-            # If this was the last retry and we still don't have classifications, raise an exception
-            if retry_count == max_retries - 1:
-                raise Exception("Failed to classify complaints after multiple attempts")
-                
-        except Exception as e:
-            # If this is the last retry, re-raise the exception
-            if retry_count == max_retries - 1:
-                print(f"All attempts to classify complaints failed: {str(e)}", file=sys.stderr)
-                raise Exception(f"Failed to classify complaints: {str(e)}")
-            else:
-                print(f"Attempt {retry_count+1} failed: {str(e)}. Retrying...", file=sys.stderr)
+            for record in records if isinstance(records, list) else []:
+                if isinstance(record, dict) and isinstance(record.get("complaint_type"), str):
+                    record["complaint_type"] = canonical.get(
+                        record["complaint_type"].strip().lower(), record["complaint_type"]
+                    )
+            accepted, _ = record_schema.validate_records(
+                records, schema, [complaint.get("id") for complaint in batch]
+            )
+            for key, record in accepted.items():
+                complaint_types[key] = record["complaint_type"]
+        
+        pending = [complaint for complaint in pending if str(complaint.get("id")) not in complaint_types]
+        print(f"Attempt {retry_count+1}: {len(complaint_types)} classified, {len(pending)} still to classify", file=sys.stderr)
+        if not pending:
+            break
+    
+    if pending:
+        if not complaint_types:
+            print("All attempts to classify complaints failed", file=sys.stderr)
+            raise Exception("Failed to classify complaints after multiple attempts")
+        # Assign a default category from our list to whatever is still unclassified
+        print(f"Assigning {len(pending)} unclassified complaints to {categories[0]}", file=sys.stderr)
+        for complaint in pending:
+            complaint_types[str(complaint.get("id"))] = categories[0]
+    
+    classified_complaints = []
+    for complaint in complaints:
+        complaint_with_type = complaint.copy()
+        complaint_with_type["complaint_type"] = complaint_types[str(complaint.get("id"))]
+        classified_complaints.append(complaint_with_type)
+    
+    return {
+        "categories": categories,
+        "classified_complaints": classified_complaints
+    }
 
-def get_classified_complaints():
+def get_classified_complaints(rebuild_taxonomy=False):
     """API endpoint function to get classified complaints"""
-    result = classify_complaints()
+    result = classify_complaints(rebuild_taxonomy=rebuild_taxonomy)
     return result
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Classify analyzed complaints into categories')
+    parser.add_argument('--rebuild-taxonomy', action='store_true', help='Generate new categories instead of reusing the stored taxonomy')
+    args = parser.parse_args()
+
     # Run the classification and print the result
-    result = classify_complaints()
+    result = classify_complaints(rebuild_taxonomy=args.rebuild_taxonomy)
     print(json.dumps(result))
\ No newline at end of file
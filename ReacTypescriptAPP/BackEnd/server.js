@@ -1,9 +1,10 @@
 const express = require('express');
 const cors = require('cors');
 const fs = require('fs');
+const os = require('os');
 const path = require('path');
 const axios = require('axios');
-const { PythonShell } = require('python-shell');
+const { getWorkerPool } = require('./analysis_worker_pool');
 const multer = require('multer');
 require('dotenv').config(); // Load environment variables from .env file
 const app = express();
@@ -19,8 +20,7 @@ const storage = multer.diskStorage({
   }
 });
 
-const upload = multer({ 
-  storage: storage,
+const uploadOptions = {
   fileFilter: function(req, file, cb) {
     // Accept only JSON files
     if (file.mimetype !== 'application/json') {
@@ -31,7 +31,13 @@ const upload = multer({
   limits: {
     fileSize: 1024 * 1024 // Limit file size to 1MB
   }
-});
+};
+
+const upload = multer({ storage: storage, ...uploadOptions });
+
+// Uploads to be analyzed stay in memory (req.file.buffer) until the request
+// writes them to its own temporary file
+const analysisUpload = multer({ storage: multer.memoryStorage(), ...uploadOptions });
 
 // Create uploads directory if it doesn't exist
 const uploadsDir = path.join(__dirname, 'uploads');
@@ -39,6 +45,9 @@ if (!fs.existsSync(uploadsDir)) {
   fs.mkdirSync(uploadsDir);
 }
 
+// Long-lived Python analysis workers (ANALYSIS_WORKERS processes, default 2)
+const workerPool = getWorkerPool();
+
 // Middleware
 app.use(cors());
 app.use(express.json());
@@ -103,46 +112,15 @@ app.get('/api/complaints', async (req, res) => {
   }
 });
 
-// Endpoint to analyze complaints using Python script
+// Endpoint to analyze complaints using the Python analysis workers
 app.get('/api/analyze-complaints', (req, res) => {
-  const pythonScriptPath = path.join(__dirname, 'analyze_complaints.py');
-  
-  // Check if the Python script exists
-  if (!fs.existsSync(pythonScriptPath)) {
-    return res.status(404).json({ error: 'Analysis script not found' });
-  }
-  
-  // Create options for Python script
-  const options = {
-    mode: 'text',
-    pythonPath: 'python', // or 'python3' depending on your environment
-    pythonOptions: ['-u'], // unbuffered output
-    scriptPath: path.dirname(pythonScriptPath),
-    args: []
-  };
-  
-  // Run the Python script with improved error handling
-  PythonShell.run('analyze_complaints.py', options)
-    .then(results => {
-      try {
-        // The last line of output should be our JSON result
-        const jsonOutput = results[results.length - 1];
-        const analysisResults = JSON.parse(jsonOutput);
-        
-        // Return the exact format needed
-        res.json(analysisResults);
-      } catch (error) {
-        console.error('Error parsing Python script output:', error);
-        console.error('Python output:', results);
-        res.status(500).json({ 
-          error: 'Failed to parse analysis results',
-          details: error.message,
-          output: results
-        });
-      }
+  workerPool.call('generate_report')
+    .then(analysisResults => {
+      // Return the exact format needed
+      res.json(analysisResults);
     })
     .catch(err => {
-      console.error('Error running Python script:', err);
+      console.error('Error running analysis worker:', err);
       res.status(500).json({ 
         error: 'Failed to analyze complaints',
         details: err.message
@@ -150,6 +128,26 @@ app.get('/api/analyze-complaints', (req, res) => {
     });
 });
 
+// Streaming variant: newline-delimited JSON, one {"partial": record} line per
+// analyzed complaint as soon as it is ready, then {"result": report} or {"error": ...}
+app.get('/api/analyze-complaints/stream', (req, res) => {
+  res.setHeader('Content-Type', 'application/x-ndjson');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.flushHeaders();
+
+  const writeLine = data => res.write(JSON.stringify(data) + '\n');
+  workerPool.call('generate_report_stream', {}, record => writeLine({ partial: record }))
+    .then(analysisResults => {
+      writeLine({ result: analysisResults });
+      res.end();
+    })
+    .catch(err => {
+      console.error('Error running analysis worker:', err);
+      writeLine({ error: 'Failed to analyze complaints', details: err.message });
+      res.end();
+    });
+});
+
 // New endpoint to handle uploaded complaints file
 app.post('/api/upload/complaints', upload.single('complaintsFile'), (req, res) => {
   try {
@@ -182,143 +180,62 @@ app.post('/api/upload/complaints', upload.single('complaintsFile'), (req, res) =
   }
 });
 
-// New endpoint to analyze uploaded complaints file
-app.post('/api/upload/analyze-complaints', upload.single('complaintsFile'), (req, res) => {
+// New endpoint to analyze uploaded complaints file. The upload is kept in memory
+// and written to a temporary directory of its own, so concurrent uploads analyzed
+// by different workers can't overwrite each other's file.
+app.post('/api/upload/analyze-complaints', analysisUpload.single('complaintsFile'), async (req, res) => {
+  let tempDir = null;
   try {
     if (!req.file) {
       throw new Error('No file uploaded');
     }
     
-    const uploadedFilePath = path.join(uploadsDir, 'uploaded-complaints.json');
-    const pythonScriptPath = path.join(__dirname, 'analyze_complaints.py');
+    tempDir = await fs.promises.mkdtemp(path.join(os.tmpdir(), 'complaints-'));
+    const tempFilePath = path.join(tempDir, 'complaints.json');
+    await fs.promises.writeFile(tempFilePath, req.file.buffer);
     
-    // Check if the Python script exists
-    if (!fs.existsSync(pythonScriptPath)) {
-      return res.status(404).json({ error: 'Analysis script not found' });
+    let analysisResults;
+    try {
+      // Analyze the uploaded file
+      analysisResults = await workerPool.call('generate_report', { file_path: tempFilePath });
+    } catch (err) {
+      console.error('Error running analysis worker:', err);
+      
+      // Fallback to analyzing the local file
+      console.log('Falling back to local file analysis...');
+      try {
+        analysisResults = await workerPool.call('generate_report');
+      } catch (fallbackErr) {
+        return res.status(500).json({ 
+          error: 'Failed to analyze complaints with fallback',
+          details: fallbackErr.message
+        });
+      }
     }
     
-    // Create a temporary copy of the uploaded file with the expected name
-    const tempFilePath = path.join(__dirname, 'temp-complaints.json');
-    fs.copyFileSync(uploadedFilePath, tempFilePath);
-    
-    // Create options for Python script with the uploaded file path
-    const options = {
-      mode: 'text',
-      pythonPath: 'python', // or 'python3' depending on your environment
-      pythonOptions: ['-u'], // unbuffered output
-      scriptPath: path.dirname(pythonScriptPath),
-      args: ['--file', tempFilePath]
-    };
-    
-    // Run the Python script with the uploaded file
-    PythonShell.run('analyze_complaints.py', options)
-      .then(results => {
-        try {
-          // Clean up the temporary file
-          if (fs.existsSync(tempFilePath)) {
-            fs.unlinkSync(tempFilePath);
-          }
-          
-          // The last line of output should be our JSON result
-          const jsonOutput = results[results.length - 1];
-          const analysisResults = JSON.parse(jsonOutput);
-          
-          // Return the exact format needed
-          res.json(analysisResults);
-        } catch (error) {
-          console.error('Error parsing Python script output:', error);
-          console.error('Python output:', results);
-          res.status(500).json({ 
-            error: 'Failed to parse analysis results',
-            details: error.message,
-            output: results
-          });
-        }
-      })
-      .catch(err => {
-        console.error('Error running Python script:', err);
-        
-        // Clean up the temporary file if it exists
-        if (fs.existsSync(tempFilePath)) {
-          fs.unlinkSync(tempFilePath);
-        }
-        
-        // Fallback to analyzing the local file
-        console.log('Falling back to local file analysis...');
-        const fallbackOptions = {
-          mode: 'text',
-          pythonPath: 'python',
-          pythonOptions: ['-u'],
-          scriptPath: path.dirname(pythonScriptPath),
-          args: []
-        };
-        
-        PythonShell.run('analyze_complaints.py', fallbackOptions)
-          .then(fallbackResults => {
-            try {
-              const jsonOutput = fallbackResults[fallbackResults.length - 1];
-              const analysisResults = JSON.parse(jsonOutput);
-              res.json(analysisResults);
-            } catch (error) {
-              res.status(500).json({ 
-                error: 'Failed to analyze complaints with fallback',
-                details: error.message
-              });
-            }
-          })
-          .catch(fallbackErr => {
-            res.status(500).json({ 
-              error: 'Failed to analyze complaints with fallback',
-              details: fallbackErr.message
-            });
-          });
-      });
+    // Return the exact format needed
+    res.json(analysisResults);
   } catch (error) {
     console.error('Error processing uploaded file:', error);
     res.status(500).json({ error: 'Failed to process uploaded file' });
+  } finally {
+    // Clean up the temporary file
+    if (tempDir) {
+      await fs.promises.rm(tempDir, { recursive: true, force: true });
+    }
   }
 });
 
-// New endpoint to classify complaints into categories
+// Classify complaints into the stored taxonomy's categories (k-NN first, then
+// batched LLM calls); ?rebuild=true creates a new taxonomy version first
 app.get('/api/analyze-complaints/classtype', (req, res) => {
-  const pythonScriptPath = path.join(__dirname, 'analyze_complaints_secondstage.py');
-  
-  // Check if the Python script exists
-  if (!fs.existsSync(pythonScriptPath)) {
-    return res.status(404).json({ error: 'Classification script not found' });
-  }
-  
-  // Create options for Python script
-  const options = {
-    mode: 'text',
-    pythonPath: 'python', // or 'python3' depending on your environment
-    pythonOptions: ['-u'], // unbuffered output
-    scriptPath: path.dirname(pythonScriptPath),
-    args: []
-  };
-  
-  // Run the Python script with improved error handling
-  PythonShell.run('analyze_complaints_secondstage.py', options)
-    .then(results => {
-      try {
-        // The last line of output should be our JSON result
-        const jsonOutput = results[results.length - 1];
-        const analysisResults = JSON.parse(jsonOutput);
-        
-        // Return the exact format needed
-        res.json(analysisResults);
-      } catch (error) {
-        console.error('Error parsing Python script output:', error);
-        console.error('Python output:', results);
-        res.status(500).json({ 
-          error: 'Failed to parse classification results',
-          details: error.message,
-          output: results
-        });
-      }
+  workerPool.call('classify_with_taxonomy', { rebuild_taxonomy: req.query.rebuild === 'true' })
+    .then(analysisResults => {
+      // Return the exact format needed
+      res.json(analysisResults);
     })
     .catch(err => {
-      console.error('Error running Python script:', err);
+      console.error('Error running analysis worker:', err);
       res.status(500).json({ 
         error: 'Failed to classify complaints',
         details: err.message
@@ -326,6 +243,22 @@ app.get('/api/analyze-complaints/classtype', (req, res) => {
     });
 });
 
+// Complaints and handling minutes per day, computed from the complaint dates;
+// ?classified=true adds the same statistics per complaint type
+app.get('/api/resolution-times', (req, res) => {
+  workerPool.call('resolution_times', { classified: req.query.classified === 'true' })
+    .then(times => {
+      res.json(times);
+    })
+    .catch(err => {
+      console.error('Error running analysis worker:', err);
+      res.status(500).json({ 
+        error: 'Failed to compute resolution times',
+        details: err.message
+      });
+    });
+});
+
 // Start the server
 app.listen(PORT, () => {
   // After the server starts and you're printing the endpoints
@@ -333,5 +266,7 @@ app.listen(PORT, () => {
   console.log('API endpoints:');
   console.log('- GET /api/complaints: Get raw complaints data');
   console.log('- GET /api/analyze-complaints: Get sentiment analysis report');
-  console.log('- GET /api/analyze-complaints/classtype: Get classified complaints');
+  console.log('- GET /api/analyze-complaints/stream: Stream analyzed complaints as NDJSON');
+  console.log('- GET /api/analyze-complaints/classtype: Get classified complaints (?rebuild=true for a new taxonomy)');
+  console.log('- GET /api/resolution-times: Get handling times per day (and per type with ?classified=true)');
 });
\ No newline at end of file
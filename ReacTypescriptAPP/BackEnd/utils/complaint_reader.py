@@ -0,0 +1,178 @@
+"""
+Streaming ingestion of complaint exports.
+
+Complaints are read lazily from JSON arrays (parsed element by element), JSON
+Lines, CSV and Parquet files, so an export of any size is read with bounded
+memory and the first records are available before the file has been read to
+the end. Each record is normalized to the field names of ComplainsList.json:
+
+    DialogID, CustomerComplaintDialog, DateCreated, Date&TimeCreated,
+    DateEnded, Date&TimeEnded
+
+Parquet support needs pyarrow, which is imported only when a Parquet file is read.
+
+The same module is used by the Streamlit backend (backend/utils) and the
+BackEnd scripts (ReacTypescriptAPP/BackEnd/utils); keep the two copies identical
+(check_shared_utils.py at the repository root compares them).
+"""
+import csv
+import json
+import os
+import sys
+
+# Characters read from a JSON file per refill of the parse buffer
+READ_SIZE = 1024 * 1024
+# Records per chunk for iter_chunks and rows per Parquet record batch
+CHUNK_SIZE = 1000
+
+FIELDS = (
+    "DialogID",
+    "CustomerComplaintDialog",
+    "DateCreated",
+    "Date&TimeCreated",
+    "DateEnded",
+    "Date&TimeEnded",
+)
+REQUIRED = ("DialogID", "CustomerComplaintDialog")
+
+# Source column names are matched ignoring case, spaces and punctuation
+_ALIASES = {
+    "dialogid": "DialogID",
+    "id": "DialogID",
+    "customercomplaintdialog": "CustomerComplaintDialog",
+    "complaint": "CustomerComplaintDialog",
+    "datecreated": "DateCreated",
+    "datetimecreated": "Date&TimeCreated",
+    "dateended": "DateEnded",
+    "datetimeended": "Date&TimeEnded",
+}
+
+_FORMATS = {
+    ".json": "json",
+    ".jsonl": "json",
+    ".ndjson": "json",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+def _column_key(name):
+    return "".join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+def _iter_json(file, read_size=READ_SIZE):
+    """
+    Yield the elements of a top-level JSON array, or every top-level value of a
+    JSON Lines / concatenated JSON file, reading read_size characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    in_array = None
+
+    while True:
+        # Skip whitespace and separators; stop at the end of the array
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ",")):
+            pos += 1
+        if pos < len(buffer):
+            if in_array is None:
+                in_array = buffer[pos] == "["
+                if in_array:
+                    pos += 1
+                continue
+            if in_array and buffer[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # A value that touches the end of the buffer may continue in the next read
+            if end is not None and (end < len(buffer) or eof):
+                yield value
+                pos = end
+                continue
+        elif eof:
+            if in_array:
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+            return
+
+        chunk = file.read(read_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _iter_parquet(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet complaint files requires pyarrow")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield from batch.to_pylist()
+
+
+def iter_rows(path, chunk_size=CHUNK_SIZE):
+    """Yield the raw rows of a complaint export as dicts, in file order"""
+    file_format = _FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Unsupported complaint file format: {path}")
+    if file_format == "parquet":
+        yield from _iter_parquet(path, chunk_size)
+        return
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            yield from _iter_json(file)
+
+
+def normalize(row):
+    """
+    Map a raw row onto FIELDS.
+
+    Returns:
+        dict: The normalized record, or None if DialogID or the dialog is missing
+    """
+    if not isinstance(row, dict):
+        return None
+    record = dict.fromkeys(FIELDS, "")
+    for name, value in row.items():
+        field = _ALIASES.get(_column_key(name))
+        if field is not None and value is not None:
+            record[field] = value
+    if any(record[field] in ("", None) for field in REQUIRED):
+        return None
+    # CSV ids arrive as text; keep them numeric like the JSON export
+    dialog_id = record["DialogID"]
+    if isinstance(dialog_id, str) and dialog_id.strip().isdigit():
+        record["DialogID"] = int(dialog_id)
+    return record
+
+
+def iter_complaints(path, chunk_size=CHUNK_SIZE):
+    """Yield normalized complaint records from path, skipping rows without an id or dialog"""
+    skipped = 0
+    for row in iter_rows(path, chunk_size):
+        record = normalize(row)
+        if record is None:
+            skipped += 1
+            continue
+        yield record
+    if skipped:
+        print(f"Warning: skipped {skipped} complaint rows without DialogID or dialog in {path}", file=sys.stderr)
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield lists of up to chunk_size normalized complaint records"""
+    chunk = []
+    for record in iter_complaints(path, chunk_size):
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,186 @@
+"""
+Complaint creation/end times parsed into datetime64 arrays, and resolution-time analytics.
+
+Exports carry a date ("2023-01-10") and a clock time ("9:32 AM") per event as
+text. They are parsed once, column-wise with NumPy, so handling durations and
+per-day or per-category aggregates are computed locally instead of passing the
+fields through the LLM. An end time earlier than the start on the same day is
+taken to have crossed midnight.
+
+The same module is used by the Streamlit backend (backend/utils) and the
+BackEnd scripts (ReacTypescriptAPP/BackEnd/utils); keep the two copies identical
+(check_shared_utils.py at the repository root compares them).
+"""
+import numpy as np
+
+# Date, time, end date, end time fields in complaint exports (see complaint_reader)
+SOURCE_FIELDS = ("DateCreated", "Date&TimeCreated", "DateEnded", "Date&TimeEnded")
+# The same fields as named in analysis output records
+OUTPUT_FIELDS = ("date_created", "time_created", "date_ended", "time_ended")
+
+
+def _text(values):
+    return np.array([value.strip() if isinstance(value, str) else "" for value in values], dtype=str)
+
+
+def _distinct(parse):
+    """
+    Run parse on the distinct values only and spread the result back; exports
+    repeat the same few thousand dates and clock times across millions of rows.
+    """
+    def parse_distinct(values):
+        distinct, inverse = np.unique(_text(values), return_inverse=True)
+        return parse(distinct)[inverse.ravel()]
+    parse_distinct.__doc__ = parse.__doc__
+    return parse_distinct
+
+
+@_distinct
+def parse_dates(text):
+    """ISO dates as a datetime64[D] array; NaT where a value is missing or invalid"""
+    try:
+        return np.where(text == "", "NaT", text).astype("datetime64[D]")
+    except ValueError:
+        # Some value is not an ISO date: convert one by one, keeping the valid ones
+        dates = np.full(len(text), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, value in enumerate(text):
+            try:
+                dates[i] = np.datetime64(value, "D") if value else np.datetime64("NaT")
+            except ValueError:
+                pass
+        return dates
+
+
+@_distinct
+def parse_clock(text):
+    """
+    Clock times ("9:32 AM", "14:05", "2:15:30 PM") as time of day, in a
+    timedelta64[m] array; NaT where a value is missing or invalid
+    """
+    text = np.char.upper(text)
+    if not len(text):
+        return np.array([], dtype="timedelta64[m]")
+    pm = np.char.endswith(text, "PM")
+    am = np.char.endswith(text, "AM")
+    clock = np.char.strip(np.char.rstrip(text, "APM "))
+    hours_text, _, rest = np.moveaxis(np.char.partition(clock, ":"), -1, 0)
+    minutes_text = np.char.partition(rest, ":")[..., 0]
+
+    valid = np.char.isdigit(hours_text) & np.char.isdigit(minutes_text)
+    hours = np.where(valid, hours_text, "0").astype(np.int64)
+    minutes = np.where(valid, minutes_text, "0").astype(np.int64)
+    valid &= np.where(am | pm, (hours >= 1) & (hours <= 12), hours < 24) & (minutes < 60)
+    hours = np.where(pm & (hours < 12), hours + 12, np.where(am & (hours == 12), 0, hours))
+
+    offsets = (hours * 60 + minutes).astype("timedelta64[m]")
+    return np.where(valid, offsets, np.timedelta64("NaT", "m"))
+
+
+def _group_stats(codes, minutes, group_count):
+    """Count and handling minutes mean/median/max per integer group code"""
+    counts = np.bincount(codes, minlength=group_count)
+    valid = ~np.isnan(minutes)
+    timed = np.bincount(codes[valid], minlength=group_count)
+    totals = np.bincount(codes[valid], weights=minutes[valid], minlength=group_count)
+
+    # Sorted by group, then duration (NaN last), so each group's durations are contiguous
+    order = np.lexsort((minutes, codes))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sorted_minutes = minutes[order]
+    stats = []
+    for group in range(group_count):
+        n = timed[group]
+        if n:
+            low = sorted_minutes[starts[group] + (n - 1) // 2]
+            high = sorted_minutes[starts[group] + n // 2]
+            stats.append({
+                "count": int(counts[group]),
+                "mean_minutes": round(float(totals[group] / n), 2),
+                "median_minutes": round(float((low + high) / 2), 2),
+                "max_minutes": round(float(sorted_minutes[starts[group] + n - 1]), 2),
+            })
+        else:
+            stats.append({
+                "count": int(counts[group]),
+                "mean_minutes": None,
+                "median_minutes": None,
+                "max_minutes": None,
+            })
+    return stats
+
+
+class ComplaintTimes:
+    """
+    Start, end and handling time of each complaint as NumPy arrays.
+
+    created/ended are datetime64[m] (NaT when unknown) and minutes is the
+    handling time as float64 (NaN when either end is unknown).
+    """
+
+    def __init__(self, ids, date_created, time_created, date_ended, time_ended):
+        """Parallel columns: ids and the date/clock text of each complaint's start and end"""
+        self.ids = np.array(ids, dtype=object)
+        self._rows = {}
+        for row, record_id in enumerate(self.ids):
+            self._rows.setdefault(str(record_id), row)
+
+        start_day = parse_dates(date_created)
+        end_day = parse_dates(date_ended)
+        # A missing end date means the complaint ended on the day it started
+        end_day = np.where(np.isnat(end_day), start_day, end_day)
+        self.created = start_day.astype("datetime64[m]") + parse_clock(time_created)
+        self.ended = end_day.astype("datetime64[m]") + parse_clock(time_ended)
+
+        crossed = (self.ended < self.created) & (end_day == start_day)
+        self.ended = np.where(crossed, self.ended + np.timedelta64(1, "D"), self.ended)
+        duration = self.ended - self.created
+        self.minutes = np.where(
+            np.isnat(duration), np.nan, duration / np.timedelta64(1, "m")
+        )
+
+    @classmethod
+    def from_records(cls, records, id_key="DialogID", fields=SOURCE_FIELDS):
+        """Times of complaint dicts; fields names their date, time, end date and end time keys"""
+        records = list(records)
+        return cls(
+            [record.get(id_key) for record in records],
+            *([record.get(field) for record in records] for field in fields),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, ids):
+        """Row positions of the given ids; ids without a complaint are skipped"""
+        return np.array(
+            [self._rows[str(i)] for i in ids if str(i) in self._rows], dtype=np.int64
+        )
+
+    def handling_minutes(self, record_id):
+        """Handling time of one complaint in minutes, or None if unknown"""
+        row = self._rows.get(str(record_id))
+        if row is None or np.isnan(self.minutes[row]):
+            return None
+        return round(float(self.minutes[row]), 2)
+
+    def daily(self, ids=None):
+        """Complaints and handling minutes per day created, oldest first"""
+        rows = np.arange(len(self)) if ids is None else self.rows(ids)
+        rows = rows[~np.isnat(self.created[rows])]
+        days, codes = np.unique(self.created[rows].astype("datetime64[D]"), return_inverse=True)
+        stats = _group_stats(codes.ravel(), self.minutes[rows], len(days))
+        return [{"date": str(day), **day_stats} for day, day_stats in zip(days, stats)]
+
+    def by_category(self, ids, labels):
+        """
+        Complaints and handling minutes per category, largest first.
+
+        ids and labels are parallel sequences, e.g. the DialogIDs of classified
+        complaints and their category names.
+        """
+        labels = np.array([str(label) for label, i in zip(labels, ids) if str(i) in self._rows], dtype=object)
+        rows = self.rows(ids)
+        names, codes = np.unique(labels.astype(str), return_inverse=True)
+        stats = _group_stats(codes.ravel(), self.minutes[rows], len(names))
+        result = [{"category": str(name), **category_stats} for name, category_stats in zip(names, stats)]
+        return sorted(result, key=lambda entry: -entry["count"])
@@ -0,0 +1,151 @@
+# Shared by backend/utils and ReacTypescriptAPP/BackEnd/utils; keep the two copies
+# identical (check_shared_utils.py at the repository root compares them).
+
+import re
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Estimated Jaccard similarity of word shingles above which two dialogs are near-duplicates
+DEFAULT_THRESHOLD = 0.8
+NUM_PERMUTATIONS = 64
+# LSH banding: BANDS * ROWS_PER_BAND == NUM_PERMUTATIONS
+BANDS = 16
+ROWS_PER_BAND = 4
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str) -> set:
+    """Word n-grams of the normalized text (the whole text if it is shorter than one shingle)."""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)}
+    return {
+        " ".join(tokens[i : i + SHINGLE_SIZE])
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the text's shingles, one row per permutation."""
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)),
+        dtype=np.uint64,
+    )
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def find_duplicates(
+    ids: List, texts: List[str], threshold: float = DEFAULT_THRESHOLD
+) -> Dict:
+    """
+    Groups near-duplicate texts with MinHash + LSH banding.
+
+    Returns:
+        dict: Maps the id of every duplicate to the id of its group's representative,
+              which is the group's first member in input order. Representatives and
+              unique texts are not included.
+    """
+    if not ids:
+        return {}
+    signatures = np.vstack([minhash(text) for text in texts])
+
+    parent = list(range(len(ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+        buckets = {}
+        for i, row in enumerate(map(bytes, rows)):
+            buckets.setdefault(row, []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if find(first) == find(other):
+                    continue
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= threshold:
+                    # Union towards the smaller index so the earliest member represents the group
+                    a, b = sorted((find(first), find(other)))
+                    parent[b] = a
+
+    return {ids[i]: ids[find(i)] for i in range(len(ids)) if find(i) != i}
+
+
+def mark_duplicates(
+    records: List[dict], text_key: str, id_key: str = "id", threshold: float = DEFAULT_THRESHOLD
+) -> List[dict]:
+    """Sets record["duplicate_of"] to the representative's id on every near-duplicate record."""
+    duplicates = find_duplicates(
+        [record[id_key] for record in records],
+        [record.get(text_key, "") for record in records],
+        threshold,
+    )
+    for record in records:
+        if record[id_key] in duplicates:
+            record["duplicate_of"] = duplicates[record[id_key]]
+    return records
+
+
+def representatives(records: List[dict]) -> List[dict]:
+    """Records that have to be sent to the LLM: everything not marked as a duplicate."""
+    return [record for record in records if "duplicate_of" not in record]
+
+
+def fan_out(
+    results: List[dict],
+    records: List[dict],
+    id_key: str = "id",
+    own_fields: Optional[Callable[[dict], dict]] = None,
+) -> List[dict]:
+    """
+    Expands per-representative LLM results back to every source record.
+
+    Each duplicate gets a copy of its representative's result with its own id and a
+    "duplicate_of" pointer; own_fields(record) can supply fields that must come from
+    the duplicate itself rather than the representative. Output follows the order of
+    `records`; results that match no record are appended at the end.
+    """
+    by_id = {}
+    for result in results:
+        if isinstance(result, dict) and "id" in result:
+            by_id.setdefault(str(result["id"]), result)
+    source_ids = {str(record[id_key]) for record in records}
+
+    expanded = []
+    for record in records:
+        representative = record.get("duplicate_of")
+        if representative is None:
+            result = by_id.get(str(record[id_key]))
+            if result is not None:
+                expanded.append(result)
+            continue
+        result = by_id.get(str(representative))
+        if result is None:
+            continue
+        copy = dict(result)
+        copy["id"] = record[id_key]
+        copy["duplicate_of"] = representative
+        if own_fields:
+            copy.update(own_fields(record))
+        expanded.append(copy)
+
+    expanded.extend(
+        result
+        for result in results
+        if not (isinstance(result, dict) and str(result.get("id")) in source_ids)
+    )
+    return expanded
@@ -0,0 +1,242 @@
+"""
+Local nearest-neighbour classifier for complaint summaries.
+
+Complaints labeled by the LLM are kept in a small on-disk vector index.
+New complaints get a complaint_type by similarity-weighted k-NN vote, and only
+the ones whose vote margin is too low need to go back to the LLM.
+
+Vectors are hashed word unigram/bigram features, so no embedding API call is
+needed. Small indexes are searched exhaustively; past IVF_MIN_SIZE rows an IVF
+(inverted file) structure probes only the lists nearest to each query. Its
+trained centroids are saved next to the index, so they are only retrained after
+the labeled rows change.
+
+Use get_index() to share one loaded index per file across calls; it is only
+reloaded when another process has saved new rows to the file.
+"""
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "knn_index.npz")
+# Width of the hashed feature vectors
+HASH_DIM = 2048
+# Neighbours consulted per vote
+K_NEIGHBOURS = 7
+# Minimum (best - runner-up) / total vote share to trust the k-NN label
+MIN_MARGIN = 0.35
+# Neighbours less similar than this do not vote
+MIN_SIMILARITY = 0.2
+# With fewer voting neighbours than this the margin is treated as zero
+MIN_VOTERS = 2
+# Index size from which the IVF structure replaces exhaustive search
+IVF_MIN_SIZE = 20000
+# Inverted lists probed per query
+IVF_PROBES = 8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def vectorize(texts, dim=HASH_DIM):
+    """Hash word unigrams and bigrams of each text into an L2-normalized float32 row"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            vectors[row, zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class KNNIndex:
+    """Labeled complaint vectors persisted as one .npz file"""
+
+    def __init__(self, path=INDEX_PATH, dim=HASH_DIM):
+        self.path = path
+        self.ivf_path = os.path.splitext(path)[0] + "_ivf.npz"
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self._mtime = _mtime(self.path)
+        if self._mtime is not None:
+            data = np.load(self.path, allow_pickle=False)
+            self.ids = data["ids"].astype(str)
+            self.labels = data["labels"].astype(str)
+            self.vectors = data["vectors"].astype(np.float32)
+        else:
+            self.ids = np.empty(0, dtype=str)
+            self.labels = np.empty(0, dtype=str)
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        self._ivf = None
+        self._dirty = False
+
+    def refresh(self):
+        """Reload the rows if the file was saved by another process since they were read"""
+        with self._lock:
+            if not self._dirty and _mtime(self.path) != self._mtime:
+                self._load()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, texts, labels):
+        """Insert labeled complaints; a complaint id that is already indexed is replaced"""
+        if not ids:
+            return
+        ids = np.asarray([str(i) for i in ids])
+        with self._lock:
+            keep = ~np.isin(self.ids, ids)
+            self.ids = np.concatenate([self.ids[keep], ids])
+            self.labels = np.concatenate([self.labels[keep], np.asarray(labels, dtype=str)])
+            self.vectors = np.vstack([self.vectors[keep], vectorize(texts, self.dim)])
+            self._ivf = None
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            _save_npz(self.path, ids=self.ids, labels=self.labels, vectors=self.vectors)
+            self._mtime = _mtime(self.path)
+            self._dirty = False
+
+    def _fingerprint(self):
+        """Identifies the labeled rows the IVF centroids were trained on"""
+        return np.uint32(zlib.crc32("\n".join(self.ids.tolist()).encode("utf-8")))
+
+    def _load_centroids(self):
+        """Centroids saved for exactly these rows, or None if they must be retrained"""
+        if not os.path.exists(self.ivf_path):
+            return None
+        try:
+            data = np.load(self.ivf_path, allow_pickle=False)
+            if int(data["rows"]) != len(self.ids) or data["fingerprint"] != self._fingerprint():
+                return None
+            return data["centroids"].astype(np.float32)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _train_centroids(self):
+        """Coarse k-means quantizer over the index, a few Lloyd iterations are enough"""
+        n_lists = int(np.sqrt(len(self.ids)))
+        rng = np.random.default_rng(0)
+        centroids = self.vectors[rng.choice(len(self.ids), n_lists, replace=False)]
+        for _ in range(5):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            filled = np.bincount(assignment, minlength=n_lists) > 0
+            norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+        _save_npz(self.ivf_path, centroids=centroids, rows=len(self.ids), fingerprint=self._fingerprint())
+        return centroids
+
+    def _build_ivf(self):
+        """Inverted lists over the saved centroids, training them first if the rows changed"""
+        with self._lock:
+            if self._ivf is not None:
+                return self._ivf
+            centroids = self._load_centroids()
+            if centroids is None:
+                centroids = self._train_centroids()
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            lists = [np.flatnonzero(assignment == i) for i in range(len(centroids))]
+            self._ivf = (centroids, lists)
+            return self._ivf
+
+    def search(self, queries, k=K_NEIGHBOURS):
+        """
+        Top-k neighbours for each query vector.
+
+        Returns:
+            list: One (row indices, cosine similarities) pair per query, best first
+        """
+        if len(self.ids) == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+
+        if len(self.ids) < IVF_MIN_SIZE:
+            similarities = queries @ self.vectors.T
+            results = []
+            for row in similarities:
+                top = np.argpartition(-row, min(k, len(row)) - 1)[:k]
+                top = top[np.argsort(-row[top])]
+                results.append((top, row[top]))
+            return results
+
+        centroids, lists = self._ivf or self._build_ivf()
+        probes = np.argsort(-(queries @ centroids.T), axis=1)[:, :IVF_PROBES]
+        results = []
+        for query, probe in zip(queries, probes):
+            candidates = np.concatenate([lists[i] for i in probe])
+            if len(candidates) == 0:
+                results.append((candidates, np.empty(0, dtype=np.float32)))
+                continue
+            row = self.vectors[candidates] @ query
+            top = np.argpartition(-row, min(k, len(row)) - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append((candidates[top], row[top]))
+        return results
+
+    def classify(self, texts, allowed_labels, k=K_NEIGHBOURS):
+        """
+        Similarity-weighted k-NN vote restricted to the current taxonomy.
+
+        Returns:
+            list: One (label or None, margin) pair per text; None means no neighbour voted
+        """
+        allowed = set(allowed_labels)
+        predictions = []
+        for rows, similarities in self.search(vectorize(texts, self.dim), k):
+            votes = {}
+            voters = 0
+            for row, similarity in zip(rows, similarities):
+                label = self.labels[row]
+                if similarity >= MIN_SIMILARITY and label in allowed:
+                    votes[label] = votes.get(label, 0.0) + float(similarity)
+                    voters += 1
+            if not votes:
+                predictions.append((None, 0.0))
+                continue
+            ranked = sorted(votes.values(), reverse=True)
+            runner_up = ranked[1] if len(ranked) > 1 else 0.0
+            best = max(votes, key=votes.get)
+            margin = (ranked[0] - runner_up) / sum(ranked) if voters >= MIN_VOTERS else 0.0
+            predictions.append((str(best), margin))
+        return predictions
+
+
+def _save_npz(path, **arrays):
+    """Write through a temporary file so other workers never load a partial file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, path)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path=INDEX_PATH):
+    """Returns the shared index for `path`, loading it on first use and after another process saved it"""
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = KNNIndex(path)
+            return _indexes[path]
+        index = _indexes[path]
+    index.refresh()
+    return index
@@ -0,0 +1,224 @@
+"""
+Shared HTTP client for OCI Generative AI inference calls.
+
+All analyzer scripts go through one pooled requests.Session so that repeated
+calls reuse keep-alive TCP+TLS connections instead of handshaking every time.
+The asyncio API runs the same pooled calls concurrently with a bounded limit,
+and stream_inference yields generated text as server-sent events arrive.
+Successful completions are kept in a disk-backed cache keyed by model and payload.
+"""
+import asyncio
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import llm_cache
+
+# Default per-call deadline in seconds
+DEFAULT_TIMEOUT = 60
+# Keep-alive connections kept open per host
+POOL_SIZE = 16
+# Upper bound on in-flight requests for the asyncio API
+MAX_CONCURRENCY = 8
+
+# LLM response cache settings
+CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm_cache.sqlite")
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+# Shared by every event loop and thread using the asyncio API, so concurrent
+# callers together never have more than MAX_CONCURRENCY requests in flight
+_inflight = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+class CachedResponse:
+    """Stands in for requests.Response when a completion is served from the cache"""
+
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def get_cache():
+    """Return the shared LLM response cache"""
+    return llm_cache.get_cache(CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_BYTES)
+
+
+def cache_key(model_config, payload):
+    """Cache key for an inference request: model, sampling settings, prompt and inputs"""
+    sampling = {key: value for key, value in payload.items() if key not in ("prompt", "inputs")}
+    return llm_cache.make_key(model_config["model_id"], sampling, payload.get("prompt"), payload.get("inputs"))
+
+
+def forget(model_config, payload):
+    """Drop a cached completion, e.g. one the caller could not parse"""
+    get_cache().delete(cache_key(model_config, payload))
+
+
+def inference_url(model_config):
+    """Build the inference URL for a MODEL_REGISTRY entry"""
+    return f"{model_config['service_endpoint']}/inference/{model_config['model_id']}"
+
+
+def build_headers(api_key):
+    """Standard headers for an OCI AI inference request"""
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+
+def post_inference(model_config, payload, api_key, timeout=DEFAULT_TIMEOUT, use_cache=True):
+    """
+    Send one inference request over the pooled session.
+
+    Args:
+        model_config (dict): Entry from MODEL_REGISTRY
+        payload (dict): JSON body for the request
+        api_key (str): OCI API key
+        timeout (float): Deadline in seconds for connecting and reading
+        use_cache (bool): Serve repeats from the LLM cache and store new 200 responses
+
+    Returns:
+        requests.Response or CachedResponse: The HTTP response
+    """
+    if use_cache:
+        key = cache_key(model_config, payload)
+        cached = get_cache().get(key)
+        if cached is not None:
+            return CachedResponse(cached)
+
+    response = get_session().post(
+        inference_url(model_config),
+        headers=build_headers(api_key),
+        json=payload,
+        timeout=timeout
+    )
+    if use_cache and response.status_code == 200:
+        get_cache().put(key, response.text)
+    return response
+
+
+def stream_inference(model_config, payload, api_key, timeout=DEFAULT_TIMEOUT, use_cache=True):
+    """
+    Send one inference request with streaming enabled and yield the generated
+    text piece by piece as server-sent events arrive.
+
+    The complete text is stored in the LLM cache in the same form post_inference
+    caches it, and a cached completion is replayed as a single piece.
+
+    Args:
+        model_config (dict): Entry from MODEL_REGISTRY
+        payload (dict): JSON body for the request, without the stream flag
+        api_key (str): OCI API key
+        timeout (float): Deadline in seconds for connecting and between events
+        use_cache (bool): Serve repeats from the LLM cache and store new completions
+
+    Yields:
+        str: Consecutive pieces of the generated text
+    """
+    key = cache_key(model_config, payload)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            yield json.loads(cached).get("generated_text", "")
+            return
+
+    response = get_session().post(
+        inference_url(model_config),
+        headers=build_headers(api_key),
+        json={**payload, "stream": True},
+        timeout=timeout,
+        stream=True
+    )
+    with response:
+        response.raise_for_status()
+        pieces = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            piece = event.get("text") or event.get("generated_text") or ""
+            if piece:
+                pieces.append(piece)
+                yield piece
+
+    if use_cache:
+        get_cache().put(key, json.dumps({"generated_text": "".join(pieces)}))
+
+
+def _bounded_post_inference(model_config, payload, api_key, timeout):
+    with _inflight:
+        return post_inference(model_config, payload, api_key, timeout)
+
+
+async def async_post_inference(model_config, payload, api_key, timeout=DEFAULT_TIMEOUT, semaphore=None):
+    """
+    Asyncio version of post_inference.
+
+    The call runs on a worker thread using the same pooled session, within the
+    process-wide MAX_CONCURRENCY limit and, if given, the caller's semaphore.
+    `timeout` is enforced by requests on the connection itself; a thread can't
+    be cancelled, so an asyncio deadline would only abandon the request while it
+    kept holding a pooled connection.
+    """
+    if semaphore is None:
+        return await asyncio.to_thread(_bounded_post_inference, model_config, payload, api_key, timeout)
+    async with semaphore:
+        return await asyncio.to_thread(_bounded_post_inference, model_config, payload, api_key, timeout)
+
+
+async def gather_inference(model_config, payloads, api_key, timeout=DEFAULT_TIMEOUT, max_concurrency=MAX_CONCURRENCY):
+    """
+    Send several inference requests concurrently, at most max_concurrency at a time.
+
+    Returns a list aligned with payloads; a failed call yields its exception
+    instead of a response so one failure does not cancel the others.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(async_post_inference(model_config, payload, api_key, timeout, semaphore) for payload in payloads),
+        return_exceptions=True
+    )
+
+
+def post_inference_many(model_config, payloads, api_key, timeout=DEFAULT_TIMEOUT, max_concurrency=MAX_CONCURRENCY):
+    """
+    Synchronous entry point for gather_inference, for scripts without an event loop.
+
+    Raises RuntimeError when called from a running event loop; await
+    gather_inference there instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_inference(model_config, payloads, api_key, timeout, max_concurrency))
+    raise RuntimeError("post_inference_many can't run inside an event loop; await gather_inference instead")
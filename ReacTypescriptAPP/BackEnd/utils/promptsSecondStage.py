@@ -27,10 +27,6 @@ Return your analysis in this EXACT JSON format:
       "id": 1,
       "summary": "Customer's fridge is not cooling properly and needs warranty service.",
       "sentiment_score": 3,
-      "date_created": "2023-01-10",
-      "time_created": "9:30 AM",
-      "date_ended": "2023-01-10",
-      "time_ended": "9:45 AM",
       "complaint_type": "Product Defect"
     },
     ... and so on for each complaint
@@ -45,12 +41,67 @@ IMPORTANT:
 - Return valid JSON that can be parsed
 """
 
+# Two-step classification (enhanced_complaint_classifier.py)
+
+# Step 1: derive the taxonomy from a sample of summaries
+CATEGORY_CREATION = """You are an expert complaint classifier for SMEG appliances. Your task is to:
+
+1. Read all the customer complaint summaries provided in the input
+2. Create EXACTLY 8 distinct complaint categories that best represent all the complaints
+3. Return ONLY these 8 categories in a JSON array format
+
+IMPORTANT: You MUST create exactly 8 categories based on the actual complaint data. Do not use generic categories unless they truly represent the data.
+
+The summaries are a representative sample of a larger set, so the categories should be comprehensive and cover all types of complaints in the dataset.
+Return your analysis in this EXACT JSON format:
+{
+  "categories": ["Category1", "Category2", "Category3", "Category4", "Category5", "Category6", "Category7", "Category8"]
+}"""
+
+# Step 1 follow-up: complete a partial category list instead of starting over.
+# {count} and {categories} are filled in with str.format, so literal braces are doubled.
+ADDITIONAL_CATEGORIES = """You are an expert complaint classifier for SMEG appliances. A taxonomy of complaint categories is being built from the customer complaint summaries provided in the input.
+
+These categories already exist: {categories}
+
+Create EXACTLY {count} more distinct complaint categories that cover complaint types the existing categories miss. Do not repeat or rename existing categories.
+
+Return ONLY the new categories in this EXACT JSON format:
+{{
+  "categories": ["New Category 1", "New Category 2"]
+}}"""
+
+# Step 2: classify one batch of complaints against the fixed taxonomy.
+# {categories} is filled in with str.format, so literal braces are doubled.
+COMPLAINT_CLASSIFICATION = """You are an expert complaint classifier for SMEG appliances. Your task is to:
+
+1. Use the 8 predefined categories provided
+2. Assign each complaint to exactly one of these 8 categories based on the complaint summary
+3. Return only the id and the assigned category of each complaint
+
+Categories: {categories}
+
+The input is a JSON array of {{"id", "summary"}} objects.
+
+Return your analysis in this EXACT JSON format, with one entry for every complaint in the input:
+{{
+  "classified_complaints": [
+    {{"id": 1, "complaint_type": "One of the categories, spelled exactly as given"}}
+  ]
+}}"""
+
 # Define the prompt sets for different models
 PROMPT_SETS = {
     "cohere_oci": {
-        "classification": CLASSIFICATION
+        "classification": CLASSIFICATION,
+        "category_creation": CATEGORY_CREATION,
+        "additional_categories": ADDITIONAL_CATEGORIES,
+        "complaint_classification": COMPLAINT_CLASSIFICATION
     },
     "meta_oci": {
-        "classification": CLASSIFICATION
+        "classification": CLASSIFICATION,
+        "category_creation": CATEGORY_CREATION,
+        "additional_categories": ADDITIONAL_CATEGORIES,
+        "complaint_classification": COMPLAINT_CLASSIFICATION
     }
 }
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Per-record validation of LLM output against small JSON-schema-style dicts.
+
+Only the subset the analyzers need is supported: "required", and per property
+"type" (a name or list of names) and "enum". Validating record by record lets a
+caller keep the good part of a response and re-request only what was missing
+or malformed, instead of retrying the whole batch.
+"""
+
+_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+def _type_ok(value, type_names):
+    if isinstance(type_names, str):
+        type_names = [type_names]
+    for name in type_names:
+        # bool is a subclass of int, but never a valid id or count
+        if name in ("integer", "number") and isinstance(value, bool):
+            continue
+        if isinstance(value, _TYPES[name]):
+            return True
+    return False
+
+
+def matches(record, schema):
+    """True if record is an object with every required property and valid property values"""
+    if not isinstance(record, dict):
+        return False
+    for key in schema.get("required", []):
+        if key not in record:
+            return False
+    for key, spec in schema.get("properties", {}).items():
+        if key not in record:
+            continue
+        if "type" in spec and not _type_ok(record[key], spec["type"]):
+            return False
+        if "enum" in spec and record[key] not in spec["enum"]:
+            return False
+    return True
+
+
+def validate_records(records, schema, requested_ids, id_key="id"):
+    """
+    Split an LLM response into accepted records and the ids that still need an answer.
+
+    A record is accepted when it matches the schema and its id is one that was
+    requested; the first valid record per id wins.
+
+    Returns:
+        tuple: (dict of str(id) -> accepted record, list of requested ids without
+               a valid record, in request order)
+    """
+    requested = {str(record_id): record_id for record_id in requested_ids}
+    accepted = {}
+    for record in records if isinstance(records, list) else []:
+        if not matches(record, schema):
+            continue
+        key = str(record[id_key])
+        if key in requested and key not in accepted:
+            accepted[key] = record
+    missing = [record_id for key, record_id in requested.items() if key not in accepted]
+    return accepted, missing
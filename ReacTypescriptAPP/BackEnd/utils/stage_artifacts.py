@@ -0,0 +1,50 @@
+"""
+On-disk cache of pipeline stage results keyed by a hash of the input dataset.
+
+The first-stage report (summaries and sentiment per complaint) is stored once per
+distinct complaint list, so the second stage can read it in-process instead of
+asking the Node server to run the whole first stage again over HTTP.
+"""
+import hashlib
+import json
+import os
+import time
+
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "stages")
+# Artifacts older than this are treated as missing and recomputed
+MAX_AGE_SECONDS = 7 * 24 * 3600
+
+
+def dataset_hash(records, *context):
+    """
+    Hash of the records plus anything else the stage result depends on
+    (model id, prompt text), independent of dict key order
+    """
+    canonical = json.dumps([records, list(context)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _path(stage, digest, directory):
+    return os.path.join(directory, stage, f"{digest}.json")
+
+
+def load(stage, digest, max_age=MAX_AGE_SECONDS, directory=ARTIFACT_DIR):
+    """Return the stored result for this stage and dataset, or None if missing or stale"""
+    path = _path(stage, digest, directory)
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save(stage, digest, result, directory=ARTIFACT_DIR):
+    """Store a stage result atomically so concurrent workers never read a partial file"""
+    path = _path(stage, digest, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(temp_path, path)
@@ -0,0 +1,90 @@
+"""
+Persisted, versioned complaint taxonomy.
+
+Each version records the category list, when it was created, a fingerprint of the
+dataset it was generated from and the hashes of the complaints in that dataset.
+Classification reuses the latest version while the complaints it is applied to
+still look like the ones it was built from; drift is the share of current
+complaints the taxonomy has never seen.
+
+Complaints are identified by DialogID and a hash of their dialog text, not by
+their LLM summaries: a summary's wording changes whenever the first stage runs
+again, the complaint it describes does not.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "taxonomy.json")
+# Rebuild once more than this share of the complaints is new to the taxonomy
+DRIFT_THRESHOLD = 0.3
+# Older versions kept in the store for reference
+MAX_HISTORY = 10
+
+
+def complaint_hash(complaint):
+    """Short stable hash of a complaint's id and normalized dialog text"""
+    dialog = " ".join(str(complaint.get("original_dialog") or "").lower().split())
+    key = f"{complaint.get('id')}\n{dialog}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint(hashes):
+    """Order-independent fingerprint of a dataset's complaint hashes"""
+    return hashlib.sha256("\n".join(sorted(set(hashes))).encode("utf-8")).hexdigest()
+
+
+def drift(taxonomy, complaints):
+    """Share of complaints whose hash the taxonomy version was not built from (0.0 - 1.0)"""
+    hashes = {complaint_hash(complaint) for complaint in complaints}
+    if not hashes:
+        return 0.0
+    # Versions stored before complaint hashes only have summary hashes and count as drifted
+    known = set(taxonomy.get("complaint_hashes", []))
+    return len(hashes - known) / len(hashes)
+
+
+class TaxonomyStore:
+    """Taxonomy versions in one JSON file, latest last"""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"versions": []}
+
+    def current(self):
+        """Latest taxonomy version, or None if none was stored yet"""
+        versions = self._read()["versions"]
+        return versions[-1] if versions else None
+
+    def save(self, categories, complaints):
+        """Store categories as a new version built from these complaints and return it"""
+        hashes = sorted({complaint_hash(complaint) for complaint in complaints})
+        with self._lock:
+            data = self._read()
+            previous = data["versions"][-1]["version"] if data["versions"] else 0
+            taxonomy = {
+                "version": previous + 1,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "dataset_fingerprint": fingerprint(hashes),
+                "categories": list(categories),
+                "complaint_hashes": hashes,
+            }
+            data["versions"] = (data["versions"] + [taxonomy])[-(MAX_HISTORY + 1):]
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        return taxonomy
@@ -1,5 +1,10 @@
 import json
 import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
 from typing import List
 
 from langchain_community.chat_models.oci_generative_ai import ChatOCIGenAI
@@ -9,16 +14,35 @@ from langchain_core.pydantic_v1 import BaseModel
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite is not installed
+    SqliteSaver = None
+
 import backend.utils.llm_config as llm_config
 import backend.message_handler as handler
+import backend.report_stats as report_stats
+import backend.utils.config as config
+from backend.utils import (
+    artifact_store,
+    clustering,
+    dedup,
+    embedding_store,
+    json_salvage,
+    llm_cache,
+    result_store,
+    sharding,
+)
 
 # Set up logging
 logging.getLogger("oci").setLevel(logging.DEBUG)
 
 
 class AgentState(BaseModel):
-    messages_info: List = []
-    categories: List = []
+    # Bulk per-complaint arrays live in the artifact store; the state (and with it
+    # every checkpoint) only holds {"artifact": hash, "count": n} references
+    messages_info: dict = {}
+    categories: dict = {}
     reports: List = []
 
 
@@ -26,12 +50,33 @@ class FeedbackAgent:
     def __init__(self, model_name: str = "cohere_oci", categ_with_embedding=False):
         self.model_name = model_name
         self.model = self.initialize_model()
-        self.memory = MemorySaver()
+        self.memory = self.initialize_checkpointer()
+        self.run_id = None
+        self.cache = llm_cache.get_cache(
+            config.LLM_CACHE_PATH,
+            config.LLM_CACHE_TTL_SECONDS,
+            config.LLM_CACHE_MAX_BYTES,
+        )
+        self.results = result_store.ResultStore(config.RESULT_STORE_PATH)
+        artifact_store.prune()
         self.builder = self.setup_graph()
-        self.messages = handler.read_messages(
-            filepath="backend/data/ComplainsList.csv"
+        # Start/end times stay out of the prompts; they are parsed once for local analytics
+        self.messages, self.times = handler.read_complaints(
+            filepath=config.COMPLAINTS_PATH,
+            dedup_threshold=config.DEDUP_THRESHOLD,
         )
         self.categ_with_embedding = categ_with_embedding
+        self.embeddings = None
+        self.embedding_store = None
+
+    def initialize_checkpointer(self):
+        if SqliteSaver is None:
+            print("langgraph-checkpoint-sqlite is not installed; runs will not be resumable")
+            return MemorySaver()
+        os.makedirs(os.path.dirname(config.CHECKPOINT_DB_PATH), exist_ok=True)
+        return SqliteSaver(
+            sqlite3.connect(config.CHECKPOINT_DB_PATH, check_same_thread=False)
+        )
 
     def initialize_model(self):
         if self.model_name not in llm_config.MODEL_REGISTRY:
@@ -65,53 +110,255 @@ class FeedbackAgent:
             )
         return embeddings
 
+    def embed_texts(self, keys, texts):
+        """
+        Returns float32 embeddings for texts, reusing vectors from the local
+        embedding store and embedding only keys that are new or changed.
+        """
+        if self.embedding_store is None:
+            model_config = llm_config.MODEL_REGISTRY[self.model_name]
+            self.embedding_store = embedding_store.EmbeddingStore(
+                os.path.join(config.EMBEDDING_STORE_DIR, model_config["embedding_model"]),
+                quantize=config.EMBEDDING_STORE_QUANTIZE,
+            )
+        return embedding_store.embed_with_store(
+            self.embedding_store, keys, texts, self._embed_batches
+        )
+
+    def _embed_batches(self, texts):
+        if self.embeddings is None:
+            self.embeddings = self.initialize_embeddings()
+        batch_size = llm_config.MODEL_REGISTRY[self.model_name]["embedding_batch_size"]
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(
+                self.embeddings.embed_documents(texts[start : start + batch_size])
+            )
+        return vectors
+
+    def _cache_key(self, request):
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        return llm_cache.make_key(
+            model_config["model_id"],
+            model_config["model_kwargs"],
+            [message.content for message in request],
+        )
+
+    def complete_many(self, requests):
+        """
+        Returns the response text for each [SystemMessage, HumanMessage] request.
+
+        Requests seen before are served from the LLM cache; the rest go to the
+        model concurrently, bounded by the model's max_concurrency.
+        """
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        keys = [self._cache_key(request) for request in requests]
+        contents = [self.cache.get(key) for key in keys]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        if missing:
+            responses = self.model.batch(
+                [requests[i] for i in missing],
+                config={"max_concurrency": model_config["max_concurrency"]},
+            )
+            for i, response in zip(missing, responses):
+                contents[i] = response.content
+                self.cache.put(keys[i], response.content)
+        return contents
+
+    def complete(self, request):
+        return self.complete_many([request])[0]
+
+    def stream_complete(self, request):
+        """
+        Yields the response text piece by piece via model.stream. A cached response
+        is replayed as one piece, and a completed stream is cached like complete().
+        """
+        key = self._cache_key(request)
+        content = self.cache.get(key)
+        if content is not None:
+            yield content
+            return
+        pieces = []
+        for chunk in self.model.stream(request):
+            if chunk.content:
+                pieces.append(chunk.content)
+                yield chunk.content
+        self.cache.put(key, "".join(pieces))
+
+    def forget(self, request):
+        """Drops a cached response, e.g. one that turned out to be unparseable."""
+        self.cache.delete(self._cache_key(request))
 
     def summarization_node(self, state: AgentState):
-        response = self.model.invoke(
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        # One representative per near-duplicate group is summarized, and of those
+        # only new or edited complaints go to the LLM; the rest reuse stored summaries
+        representatives = dedup.representatives(self.messages)
+        prompt = llm_config.get_prompt(self.model_name, "SUMMARIZATION")
+        namespace = result_store.namespace(model_config["model_id"], prompt)
+        stored, pending = self.results.partition("summarize", namespace, representatives)
+        print(f"Summarizing {len(pending)} new or changed complaints, reusing {len(stored)}")
+        shards = sharding.shard_messages(pending, model_config["shard_token_budget"])
+        requests = [
             [
-                SystemMessage(
-                    content=llm_config.get_prompt(self.model_name, "SUMMARIZATION")
-                ),
-                HumanMessage(content=f"Message batch: {self.messages}"),
+                SystemMessage(content=prompt),
+                HumanMessage(content=f"Message batch: {shard}"),
             ]
-        )
-        state.messages_info = [json.loads(response.content)]
+            for shard in shards
+        ]
+        contents = self.complete_many(requests)
+        try:
+            fresh = sharding.merge_json_arrays(contents)
+        except json.JSONDecodeError:
+            for request in requests:
+                self.forget(request)
+            raise
+        self.results.save("summarize", namespace, pending, fresh)
+        merged = result_store.merge_results(representatives, stored, fresh)
+        state.messages_info = artifact_store.put(dedup.fan_out(merged, self.messages))
         return {"messages_info": state.messages_info}
 
     def categorization_node(self, state: AgentState):
+        summaries = artifact_store.get(state.messages_info)
         if self.categ_with_embedding:
-            pass
+            categories = self.categorize_with_embeddings(summaries)
         else:
-            response = self.model.invoke(
-                [
-                    SystemMessage(
-                        content=llm_config.get_prompt(
-                            self.model_name, "CATEGORIZATION_SYSTEM"
-                        )
-                    ),
+            categories = self.categorize_summaries(summaries)
+        state.categories = artifact_store.put(categories)
+        return {"categories": state.categories}
+
+    def categorize_summaries(self, summaries, taxonomy=None):
+        """
+        Categorizes summaries with the LLM, against a fixed taxonomy if one is given.
+
+        Answers are joined to the summaries by id. Summaries the answer left out
+        are requested once more on their own, against the taxonomy of the first
+        answer, instead of repeating the whole batch.
+        """
+        categories, report = self._request_categories(summaries, taxonomy)
+        if report["missing"]:
+            missing = {str(elem_id) for elem_id in report["missing"]}
+            retry = [elem for elem in summaries if str(elem["id"]) in missing]
+            print(f"Requesting categories for {len(retry)} summaries again")
+            more, _ = self._request_categories(
+                retry, taxonomy or handler.taxonomy_paths(categories) or None
+            )
+            by_id = {str(elem["id"]): elem for elem in categories + more}
+            categories = [by_id[str(elem["id"])] for elem in summaries if str(elem["id"]) in by_id]
+        return categories
+
+    def _request_categories(self, summaries, taxonomy=None):
+        if taxonomy is None:
+            system_prompt = llm_config.get_prompt(self.model_name, "CATEGORIZATION_SYSTEM")
+        else:
+            system_prompt = llm_config.get_prompt(
+                self.model_name, "CATEGORIZATION_FIXED_SYSTEM"
+            ).format(TAXONOMY="\n".join(taxonomy))
+        request = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(
+                content=llm_config.get_prompt(
+                    self.model_name, "CATEGORIZATION_USER"
+                ).format(MESSAGE_BATCH=[summaries])
+            ),
+        ]
+        response_content = self.complete(request)
+        try:
+            assigned = json_salvage.loads(response_content)
+        except json.JSONDecodeError:
+            self.forget(request)
+            raise
+        return handler.apply_categories(summaries, assigned)
+
+    def categorize_with_embeddings(self, summaries):
+        """
+        Clusters the summary embeddings locally and asks the LLM only to name each cluster.
+        """
+        if not summaries:
+            return []
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        texts = [str(elem.get("summary", "")) for elem in summaries]
+        vectors = self.embed_texts([str(elem.get("id")) for elem in summaries], texts)
+        labels, centroids = clustering.kmeans(
+            vectors, clustering.choose_k(len(texts), model_config["max_clusters"])
+        )
+        examples = clustering.representatives(
+            vectors, labels, centroids, model_config["cluster_examples"]
+        )
+
+        prompt = llm_config.get_prompt(self.model_name, "CLUSTER_LABELING")
+        # Clusters k-means left empty have no examples and are not sent; a cluster
+        # whose reply is unusable is asked once more, then left Uncategorized
+        names = {}
+        pending = [cluster for cluster, members in enumerate(examples) if members]
+        for _ in range(2):
+            requests = {
+                cluster: [
+                    SystemMessage(content=prompt),
                     HumanMessage(
-                        content=llm_config.get_prompt(
-                            self.model_name, "CATEGORIZATION_USER"
-                        ).format(MESSAGE_BATCH=state.messages_info)
+                        content="Message summaries: "
+                        f"{json.dumps([texts[i] for i in examples[cluster]])}"
                     ),
                 ]
-            )
-            content = [json.loads(response.content)]
-            state.categories = handler.match_categories(state.messages_info, content)
-            print(state.categories)
-        return {"categories": state.categories}
+                for cluster in pending
+            }
+            contents = self.complete_many(list(requests.values()))
+            for cluster, content in zip(requests, contents):
+                try:
+                    name = handler.parse_category(json_salvage.loads(content))
+                except json.JSONDecodeError:
+                    name = None
+                if name is None:
+                    self.forget(requests[cluster])
+                else:
+                    names[cluster] = name
+            pending = [cluster for cluster in pending if cluster not in names]
+            if not pending:
+                break
+        if pending:
+            print(f"Could not name clusters {pending}; their messages are Uncategorized")
+
+        uncategorized = {field: "Uncategorized" for field in handler.CATEGORY_FIELDS}
+        categories = []
+        for elem, label in zip(summaries, labels):
+            categorized = dict(elem)
+            categorized.update(names.get(int(label), uncategorized))
+            categories.append(categorized)
+        return categories
 
     def generate_report_node(self, state: AgentState):
-        response = self.model.invoke(
+        # Statistics are computed locally; the LLM only writes the narrative,
+        # one concurrent request per primary category
+        category_stats = report_stats.compute_category_stats(
+            artifact_store.get(state.categories)
+        )
+        prompt = llm_config.get_prompt(self.model_name, "REPORT_GEN")
+        requests = [
             [
-                SystemMessage(
-                    content=llm_config.get_prompt(self.model_name, "REPORT_GEN")
+                SystemMessage(content=prompt),
+                HumanMessage(
+                    content=f"Category digest: {report_stats.build_digest(stats)}"
                 ),
-                HumanMessage(content=f"Message info: {state.categories}"),
             ]
-        )
-        state.reports = response.content
-        return {"reports": [response.content]}
+            for stats in category_stats
+        ]
+        fragments = []
+        for request, stats, content in zip(
+            requests, category_stats, self.complete_many(requests)
+        ):
+            try:
+                narrative = report_stats.parse_narrative(json_salvage.loads(content))
+            except json.JSONDecodeError as e:
+                print(f"Error parsing report for {stats['category_level_1']}: {e}")
+                narrative = None
+            if narrative is None:
+                # Not cached, so the next run asks again
+                self.forget(request)
+                narrative = {}
+            fragments.append(report_stats.merge_narrative(stats, narrative))
+        state.reports = json.dumps({"categories": fragments})
+        print(f"LLM cache: {self.cache.stats()}")
+        return {"reports": [state.reports]}
         
 
     def setup_graph(self):
@@ -130,22 +377,27 @@ class FeedbackAgent:
     def get_graph(self):
         return self.builder.get_graph()
 
-    def run(self):
-        thread = {"configurable": {"thread_id": "1"}}
-        for s in self.builder.stream(
-            config=thread,
-        ):
+    @staticmethod
+    def new_run_id():
+        return uuid.uuid4().hex
+
+    def run(self, run_id=None):
+        for s in self.run_step_by_step(run_id):
             print(f"\n \n{s}")
 
-    def run_step_by_step(self):
+    def run_step_by_step(self, run_id=None):
         """
         Run the graph step by step, yielding each state in the process.
+
+        Each run checkpoints under its own thread id (a fresh one unless run_id is
+        given), so it can be continued with resume() if it fails part way.
         """
-        thread = {"configurable": {"thread_id": "1"}}
+        self.run_id = run_id or self.new_run_id()
+        thread = {"configurable": {"thread_id": self.run_id}}
         # Step-by-step execution
         initial_state = {
-            "messages_info": [],
-            "categories": [],
+            "messages_info": {},
+            "categories": {},
             "reports":  [],
         }
 
@@ -153,6 +405,225 @@ class FeedbackAgent:
         for state in self.builder.stream(initial_state, thread):
             yield state  # Yield each intermediate step to allow step-by-step execution
 
+    def resume(self, run_id):
+        """
+        Continue a checkpointed run after its last completed node, yielding the
+        remaining steps. Yields nothing if the run already finished.
+        """
+        self.run_id = run_id
+        thread = {"configurable": {"thread_id": run_id}}
+        for state in self.builder.stream(None, thread):
+            yield state
+
+    def run_pipelined(self, run_id=None, stream=False):
+        """
+        Streams complaints through summarize -> categorize -> report in micro-batches.
+
+        Summarization and categorization run in their own threads connected by
+        bounded queues: batch N+1 is summarized while batch N is categorized, and a
+        slow stage blocks the one feeding it instead of letting batches pile up in
+        memory. The taxonomy is created from the first batch and every later batch
+        is categorized against it. Yields {node: output} dicts like
+        run_step_by_step (one summarize and one categorize step per batch, as they
+        finish) followed by the report over all batches.
+
+        With stream=True summaries are streamed from the model, and each one is
+        yielded as a summarize step as soon as its JSON record is complete; the
+        batch's categorize step follows once the whole shard has arrived.
+
+        Pipelined runs are not checkpointed; a rerun reuses the per-complaint
+        results stored by the summarize stage instead.
+        """
+        self.run_id = run_id or self.new_run_id()
+        queue_size = llm_config.MODEL_REGISTRY[self.model_name]["pipeline_queue_size"]
+        summarized = queue.Queue(maxsize=queue_size)
+        steps = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        stages = [
+            (self._summarize_batches(stream), summarized),
+            (self._categorize_batches(summarized, stop), steps),
+        ]
+        for produce, output in stages:
+            threading.Thread(
+                target=_run_stage, args=(produce, output, stop), daemon=True
+            ).start()
+
+        categories = []
+        try:
+            while True:
+                step = steps.get()
+                if step is _DONE:
+                    break
+                if isinstance(step, _StageError):
+                    raise step.error
+                if "categorize" in step:
+                    categories.extend(step["categorize"]["categories"])
+                yield step
+        finally:
+            # Unblocks the stages if the caller stops consuming early or a stage failed
+            stop.set()
+
+        state = AgentState(categories=artifact_store.put(categories))
+        yield {"generate_report": self.generate_report_node(state)}
+
+    def _summarize_batches(self, stream=False):
+        """
+        Yields {"batch": summaries} per shard, max_concurrency shards per LLM round.
+
+        When streaming, shards are requested one at a time and every completed
+        record is yielded first as {"partial": [summaries]}; the shard's batch
+        then carries "announced": True so it is not reported twice.
+        """
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        duplicates = {}
+        for message in self.messages:
+            if "duplicate_of" in message:
+                duplicates.setdefault(str(message["duplicate_of"]), []).append(message)
+        shards = sharding.shard_messages(
+            dedup.representatives(self.messages), model_config["shard_token_budget"]
+        )
+        prompt = llm_config.get_prompt(self.model_name, "SUMMARIZATION")
+        namespace = result_store.namespace(model_config["model_id"], prompt)
+
+        if stream:
+            yield from self._stream_batches(shards, prompt, namespace, duplicates)
+            return
+
+        for start in range(0, len(shards), model_config["max_concurrency"]):
+            group = shards[start : start + model_config["max_concurrency"]]
+            partitions = [self.results.partition("summarize", namespace, shard) for shard in group]
+            requests = {
+                i: [
+                    SystemMessage(content=prompt),
+                    HumanMessage(content=f"Message batch: {pending}"),
+                ]
+                for i, (_, pending) in enumerate(partitions)
+                if pending
+            }
+            contents = dict(zip(requests, self.complete_many(list(requests.values()))))
+
+            for i, (shard, (stored, pending)) in enumerate(zip(group, partitions)):
+                fresh = []
+                if i in contents:
+                    try:
+                        fresh = sharding.merge_json_arrays([contents[i]])
+                    except json.JSONDecodeError:
+                        self.forget(requests[i])
+                        raise
+                    self.results.save("summarize", namespace, pending, fresh)
+                merged = result_store.merge_results(shard, stored, fresh)
+                members = list(shard)
+                for message in shard:
+                    members.extend(duplicates.get(str(message["id"]), []))
+                yield {"batch": dedup.fan_out(merged, members), "announced": False}
+
+    def _stream_batches(self, shards, prompt, namespace, duplicates):
+        for shard in shards:
+            stored, pending = self.results.partition("summarize", namespace, shard)
+            members = list(shard)
+            for message in shard:
+                members.extend(duplicates.get(str(message["id"]), []))
+            by_id = {str(message["id"]): message for message in shard}
+
+            # Stored summaries are available right away
+            if stored:
+                yield {"partial": dedup.fan_out(
+                    result_store.merge_results(shard, stored, []), members
+                )}
+
+            fresh = []
+            if pending:
+                request = [
+                    SystemMessage(content=prompt),
+                    HumanMessage(content=f"Message batch: {pending}"),
+                ]
+                parser = json_salvage.ArrayStream()
+                for piece in self.stream_complete(request):
+                    for record in parser.feed(piece):
+                        if not isinstance(record, dict) or str(record.get("id")) not in by_id:
+                            continue
+                        # A record repeated by the model is delivered once
+                        message = by_id.pop(str(record["id"]))
+                        fresh.append(record)
+                        yield {"partial": dedup.fan_out(
+                            [record], [message] + duplicates.get(str(message["id"]), [])
+                        )}
+                if len(fresh) < len(pending):
+                    # Don't replay a response that left complaints out
+                    self.forget(request)
+                self.results.save("summarize", namespace, pending, fresh)
+
+            merged = result_store.merge_results(shard, stored, fresh)
+            yield {"batch": dedup.fan_out(merged, members), "announced": True}
+
+    def _categorize_batches(self, summarized, stop):
+        """
+        Categorizes summary batches from the queue as they arrive, yielding a
+        summarize step for each batch and then its categorize step.
+        """
+        taxonomy = None
+        while True:
+            item = _take(summarized, stop)
+            if item is _DONE:
+                return
+            if "partial" in item:
+                yield {"summarize": {"messages_info": [item["partial"]]}}
+                continue
+            summaries = item["batch"]
+            if not item["announced"]:
+                yield {"summarize": {"messages_info": [summaries]}}
+
+            categories = self.categorize_summaries(summaries, taxonomy)
+            if taxonomy is None:
+                taxonomy = handler.taxonomy_paths(categories) or None
+            yield {"categorize": {"categories": categories}}
+
+
+class _StageError:
+    """Carries an exception from a pipeline stage thread to its consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+# End-of-stream marker passed through the pipeline queues
+_DONE = object()
+
+
+def _take(source, stop):
+    """Next item from a stage queue; re-raises upstream errors, _DONE once stopped."""
+    while not stop.is_set():
+        try:
+            item = source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if isinstance(item, _StageError):
+            raise item.error
+        return item
+    return _DONE
+
+
+def _run_stage(produce, output, stop):
+    """Feeds a stage's items into its bounded output queue, then _DONE or the error."""
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for item in produce:
+            if not put(item):
+                return
+    except Exception as e:
+        put(_StageError(e))
+        return
+    put(_DONE)
+
 
 # Constants
 
@@ -1,6 +1,8 @@
 import json
 import logging
-from typing import List
+import os
+import sqlite3
+import uuid
 
 from langchain_community.chat_models.oci_generative_ai import ChatOCIGenAI
 from langchain_community.embeddings import OCIGenAIEmbeddings
@@ -9,29 +11,64 @@ from langchain_core.pydantic_v1 import BaseModel
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph
 
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite is not installed
+    SqliteSaver = None
+
 import backend.utils.llm_configM as llm_config
 import backend.message_handlerM as handler
+import backend.utils.config as config
+from backend.utils import (
+    artifact_store,
+    complaint_record,
+    dedup,
+    json_salvage,
+    llm_cache,
+    result_store,
+    sharding,
+)
 
 # Set up logging
 logging.getLogger("oci").setLevel(logging.DEBUG)
 
 
 class AgentState(BaseModel):
-    messages_info: List = []
-    reports: List = []
+    # Both fields are artifact store references, so checkpoints stay the same
+    # size however many complaints a run processes
+    messages_info: dict = {}
+    reports: dict = {}
 
 
 class FeedbackAgent:
     def __init__(self, model_name: str = "cohere_oci", categ_with_embedding=False):
         self.model_name = model_name
         self.model = self.initialize_model()
-        self.memory = MemorySaver()
+        self.memory = self.initialize_checkpointer()
+        self.run_id = None
+        self.cache = llm_cache.get_cache(
+            config.LLM_CACHE_PATH,
+            config.LLM_CACHE_TTL_SECONDS,
+            config.LLM_CACHE_MAX_BYTES,
+        )
+        self.results = result_store.ResultStore(config.RESULT_STORE_PATH)
+        artifact_store.prune()
         self.builder = self.setup_graph()
         self.messages = handler.read_messages(
-            filepath="backend/data/ComplainsList.json"
+            filepath=config.COMPLAINTS_PATH,
+            dedup_threshold=config.DEDUP_THRESHOLD,
         )
         self.categ_with_embedding = categ_with_embedding
 
+    def initialize_checkpointer(self):
+        if SqliteSaver is None:
+            print("langgraph-checkpoint-sqlite is not installed; runs will not be resumable")
+            return MemorySaver()
+        os.makedirs(os.path.dirname(config.CHECKPOINT_DB_PATH), exist_ok=True)
+        return SqliteSaver(
+            sqlite3.connect(config.CHECKPOINT_DB_PATH, check_same_thread=False)
+        )
+
     def initialize_model(self):
         if self.model_name not in llm_config.MODEL_REGISTRY:
             raise ValueError(f"Unknown model: {self.model_name}")
@@ -64,29 +101,102 @@ class FeedbackAgent:
             )
         return embeddings
 
+    def _cache_key(self, request):
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        return llm_cache.make_key(
+            model_config["model_id"],
+            model_config["model_kwargs"],
+            [message.content for message in request],
+        )
+
+    def complete_many(self, requests):
+        """
+        Returns the response text for each [SystemMessage, HumanMessage] request.
+
+        Requests seen before are served from the LLM cache; the rest go to the
+        model concurrently, bounded by the model's max_concurrency.
+        """
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        keys = [self._cache_key(request) for request in requests]
+        contents = [self.cache.get(key) for key in keys]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        if missing:
+            responses = self.model.batch(
+                [requests[i] for i in missing],
+                config={"max_concurrency": model_config["max_concurrency"]},
+            )
+            for i, response in zip(missing, responses):
+                contents[i] = response.content
+                self.cache.put(keys[i], response.content)
+        return contents
+
+    def complete(self, request):
+        return self.complete_many([request])[0]
+
+    def stream_complete(self, request):
+        """
+        Yields the response text piece by piece via model.stream. A cached response
+        is replayed as one piece, and a completed stream is cached like complete().
+        """
+        key = self._cache_key(request)
+        content = self.cache.get(key)
+        if content is not None:
+            yield content
+            return
+        pieces = []
+        for chunk in self.model.stream(request):
+            if chunk.content:
+                pieces.append(chunk.content)
+                yield chunk.content
+        self.cache.put(key, "".join(pieces))
+
+    def forget(self, request):
+        """Drops a cached response, e.g. one that turned out to be unparseable."""
+        self.cache.delete(self._cache_key(request))
 
     def summarization_node(self, state: AgentState):
-        response = self.model.invoke(
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        # One representative per near-duplicate group is summarized, and of those
+        # only new or edited complaints go to the LLM; the rest reuse stored summaries
+        representatives = dedup.representatives(self.messages)
+        prompt = llm_config.get_prompt(self.model_name, "SUMMARIZATION")
+        namespace = result_store.namespace(model_config["model_id"], prompt)
+        stored, pending = self.results.partition("summarize", namespace, representatives)
+        print(f"Summarizing {len(pending)} new or changed complaints, reusing {len(stored)}")
+        shards = sharding.shard_messages(pending, model_config["shard_token_budget"])
+        requests = [
             [
-                SystemMessage(
-                    content=llm_config.get_prompt(self.model_name, "SUMMARIZATION")
-                ),
-                HumanMessage(content=f"Message batch: {self.messages}"),
+                SystemMessage(content=prompt),
+                HumanMessage(content=f"Message batch: {shard}"),
             ]
-        )
-        try:
-            state.messages_info = [json.loads(response.content)]
-            print(f"Parsed messages_info: {state.messages_info}")
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
-            print(f"Raw response: {response.content}")
-            state.messages_info = [{"error": "Failed to parse LLM response"}]
+            for shard in shards
+        ]
+        contents = self.complete_many(requests)
+        # Merge shard by shard so one malformed response doesn't discard the others
+        merged = []
+        for i, content in enumerate(contents):
+            try:
+                merged.extend(sharding.merge_json_arrays([content]))
+            except json.JSONDecodeError as e:
+                print(f"Error parsing JSON response for shard {i}: {e}")
+                print(f"Raw response: {content}")
+                self.forget(requests[i])
+        self.results.save("summarize", namespace, pending, merged)
+        merged = result_store.merge_results(representatives, stored, merged)
+        # Near-duplicates take their representative's result and keep their own dates
+        records = complaint_record.attach_results(self.messages, merged)
+        if records:
+            state.messages_info = artifact_store.put([record.to_dict() for record in records])
+            print(f"Parsed {len(records)} messages into artifact {state.messages_info['artifact']}")
+        else:
+            state.messages_info = artifact_store.put([{"error": "Failed to parse LLM response"}])
+        print(f"LLM cache: {self.cache.stats()}")
         return {"messages_info": state.messages_info}
 
     def generate_report_node(self, state: AgentState):
-        # Simply pass through the summarization results
+        # Simply pass through the summarization results (the reference, not the records)
         state.reports = state.messages_info
-        return {"reports": state.messages_info}
+        return {"reports": state.reports}
 
     def setup_graph(self):
         builder = StateGraph(AgentState)
@@ -102,28 +212,111 @@ class FeedbackAgent:
     def get_graph(self):
         return self.builder.get_graph()
 
-    def run(self):
-        thread = {"configurable": {"thread_id": "1"}}
-        for s in self.builder.stream(
-            config=thread,
-        ):
+    @staticmethod
+    def new_run_id():
+        return uuid.uuid4().hex
+
+    def run(self, run_id=None):
+        for s in self.run_step_by_step(run_id):
             print(f"\n \n{s}")
 
-    def run_step_by_step(self):
+    def run_step_by_step(self, run_id=None):
         """
         Run the graph step by step, yielding each state in the process.
+
+        Each run checkpoints under its own thread id (a fresh one unless run_id is
+        given), so it can be continued with resume() if it fails part way.
         """
-        thread = {"configurable": {"thread_id": "1"}}
+        self.run_id = run_id or self.new_run_id()
+        thread = {"configurable": {"thread_id": self.run_id}}
         # Step-by-step execution
         initial_state = {
-            "messages_info": [],
-            "reports":  [],
+            "messages_info": {},
+            "reports": {},
         }
 
         # Step-by-step execution
         for state in self.builder.stream(initial_state, thread):
             yield state  # Yield each intermediate step to allow step-by-step execution
 
+    def run_streaming(self, run_id=None):
+        """
+        Summarizes shard by shard with the model's output streamed, yielding a
+        summarize step as soon as records are ready: a shard's stored summaries
+        at once, new ones each as its JSON object completes. Ends with the
+        generate_report step over all records, like run_step_by_step.
+
+        Streaming runs are not checkpointed; a rerun reuses the per-complaint
+        results stored by the result store instead.
+        """
+        self.run_id = run_id or self.new_run_id()
+        model_config = llm_config.MODEL_REGISTRY[self.model_name]
+        prompt = llm_config.get_prompt(self.model_name, "SUMMARIZATION")
+        namespace = result_store.namespace(model_config["model_id"], prompt)
+        duplicates = {}
+        for message in self.messages:
+            if "duplicate_of" in message:
+                duplicates.setdefault(str(message["duplicate_of"]), []).append(message)
+        shards = sharding.shard_messages(
+            dedup.representatives(self.messages), model_config["shard_token_budget"]
+        )
+
+        results = []
+        for shard in shards:
+            stored, pending = self.results.partition("summarize", namespace, shard)
+            if stored:
+                members = list(shard)
+                for message in shard:
+                    members.extend(duplicates.get(str(message["id"]), []))
+                results.extend(stored.values())
+                records = complaint_record.attach_results(members, list(stored.values()))
+                yield {"summarize": {"messages_info": [[record.to_dict() for record in records]]}}
+            if not pending:
+                continue
+
+            request = [
+                SystemMessage(content=prompt),
+                HumanMessage(content=f"Message batch: {pending}"),
+            ]
+            by_id = {str(message["id"]): message for message in pending}
+            parser = json_salvage.ArrayStream()
+            fresh = []
+            for piece in self.stream_complete(request):
+                for result in parser.feed(piece):
+                    if not isinstance(result, dict) or str(result.get("id")) not in by_id:
+                        continue
+                    # A record repeated by the model is delivered once
+                    message = by_id.pop(str(result["id"]))
+                    fresh.append(result)
+                    records = complaint_record.attach_results(
+                        [message] + duplicates.get(str(message["id"]), []), [result]
+                    )
+                    yield {"summarize": {"messages_info": [[record.to_dict() for record in records]]}}
+            if len(fresh) < len(pending):
+                # Don't replay a response that left complaints out
+                self.forget(request)
+            self.results.save("summarize", namespace, pending, fresh)
+            results.extend(fresh)
+
+        # Near-duplicates take their representative's result and keep their own dates
+        records = complaint_record.attach_results(self.messages, results)
+        if records:
+            reports = artifact_store.put([record.to_dict() for record in records])
+        else:
+            reports = artifact_store.put([{"error": "Failed to parse LLM response"}])
+        print(f"LLM cache: {self.cache.stats()}")
+        yield {"generate_report": {"reports": reports}}
+
+    def resume(self, run_id):
+        """
+        Continue a checkpointed run after its last completed node, yielding the
+        remaining steps. Yields nothing if the run already finished.
+        """
+        self.run_id = run_id
+        thread = {"configurable": {"thread_id": run_id}}
+        for state in self.builder.stream(None, thread):
+            yield state
+
 
 # Constants
 
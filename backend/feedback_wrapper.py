@@ -1,10 +1,19 @@
 from backend.feedback_agent import FeedbackAgent
+from backend.utils import artifact_store
 
 
 class FeedbackAgentWrapper:
-    def __init__(self):
+    def __init__(self, run_id=None, resume=False, pipelined=False, stream=False):
         self.agent = FeedbackAgent()
-        self.run_graph = self.agent.run_step_by_step()
+        self.run_id = run_id or self.agent.new_run_id()
+        if pipelined:
+            # Micro-batched streaming through all stages; partial results per batch,
+            # or per summary as the model writes it with stream=True
+            self.run_graph = self.agent.run_pipelined(self.run_id, stream=stream)
+        elif resume:
+            self.run_graph = self.agent.resume(self.run_id)
+        else:
+            self.run_graph = self.agent.run_step_by_step(self.run_id)
 
     def get_nodes_edges(self):
         graph_data = self.agent.get_graph()
@@ -16,6 +25,7 @@ class FeedbackAgentWrapper:
         try:
             action_output = next(self.run_graph)
             current_node = list(action_output.keys())[0]
+            action_output = resolve_output(action_output)
         except StopIteration:
             action_output = {}
             current_node = "FINALIZED"
@@ -23,3 +33,17 @@ class FeedbackAgentWrapper:
 
     def get_graph(self):
         return self.agent.get_graph()
+
+
+def resolve_output(action_output):
+    """
+    Swaps artifact references in a node's output for the records they point to,
+    in the shapes the pages expect (messages_info and reports as [records]).
+    """
+    return {
+        node: {
+            key: artifact_store.resolve(value, nested=key in ("messages_info", "reports"))
+            for key, value in (values or {}).items()
+        }
+        for node, values in action_output.items()
+    }
@@ -1,10 +1,18 @@
 from backend.feedback_agentM import FeedbackAgent
+from backend.utils import artifact_store
 
 
 class FeedbackAgentWrapperM:  # Changed from FeedbackAgentWrapper to FeedbackAgentWrapperM
-    def __init__(self):
+    def __init__(self, run_id=None, resume=False, stream=False):
         self.agent = FeedbackAgent()
-        self.run_graph = self.agent.run_step_by_step()
+        self.run_id = run_id or self.agent.new_run_id()
+        if stream:
+            # Summaries as the model writes them; not checkpointed, so not resumable
+            self.run_graph = self.agent.run_streaming(self.run_id)
+        elif resume:
+            self.run_graph = self.agent.resume(self.run_id)
+        else:
+            self.run_graph = self.agent.run_step_by_step(self.run_id)
 
     def get_nodes_edges(self):
         graph_data = self.agent.get_graph()
@@ -16,6 +24,7 @@ class FeedbackAgentWrapperM:  # Changed from FeedbackAgentWrapper to FeedbackAge
         try:
             action_output = next(self.run_graph)
             current_node = list(action_output.keys())[0]
+            action_output = resolve_output(action_output)
         except StopIteration:
             action_output = {}
             current_node = "FINALIZED"
@@ -23,3 +32,17 @@ class FeedbackAgentWrapperM:  # Changed from FeedbackAgentWrapper to FeedbackAge
 
     def get_graph(self):
         return self.agent.get_graph()
+
+
+def resolve_output(action_output):
+    """
+    Swaps artifact references in a node's output for the records they point to,
+    in the shapes the pages expect (messages_info and reports as [records]).
+    """
+    return {
+        node: {
+            key: artifact_store.resolve(value, nested=key in ("messages_info", "reports"))
+            for key, value in (values or {}).items()
+        }
+        for node, values in action_output.items()
+    }
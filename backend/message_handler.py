@@ -1,32 +1,106 @@
+from typing import List, Tuple
 
-import csv
-from typing import List
+from backend.utils import complaint_reader, complaint_times, dedup, id_join
+from backend.utils.category_index import CategoryIndex
 
+CATEGORY_FIELDS = ("primary_category", "secondary_category", "tertiary_category")
 
-def read_messages(filepath: str) -> List[dict]:
-    """Reads all complaints from the CSV file."""
-    with open(filepath, newline='', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        messages = []
-        for row in reader:
-            messages.append({
-                "id": row["DialogID"],
-                "Customer Complaint Dialog": row["CustomerComplaintDialog"],
-                "Date & Time Created": row["Date&TimeCreated"],
-                "Date & Time Ended": row["Date&TimeEnded"]
-            })
-    return messages
+
+def read_messages(filepath: str, dedup_threshold: float = dedup.DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Reads all complaints from the export (JSON, JSONL, CSV or Parquet).
+
+    Near-duplicate dialogs are marked with "duplicate_of" pointing at the id of
+    the complaint that represents their group.
+    """
+    return read_complaints(filepath, dedup_threshold)[0]
+
+
+def read_complaints(
+    filepath: str, dedup_threshold: float = dedup.DEFAULT_THRESHOLD
+) -> Tuple[List[dict], complaint_times.ComplaintTimes]:
+    """
+    Reads the complaints as messages for the LLM plus their parsed start/end times.
+
+    Messages only carry the id and dialog; the times stay local, parsed into
+    datetime64 arrays for handling-time analytics.
+    """
+    messages = []
+    columns = ([], [], [], [])
+    for row in complaint_reader.iter_complaints(filepath):
+        messages.append({
+            "id": row["DialogID"],
+            "Customer Complaint Dialog": row["CustomerComplaintDialog"],
+        })
+        for column, field in zip(columns, complaint_times.SOURCE_FIELDS):
+            column.append(row[field])
+    times = complaint_times.ComplaintTimes([message["id"] for message in messages], *columns)
+    messages = dedup.mark_duplicates(
+        messages, "Customer Complaint Dialog", threshold=dedup_threshold
+    )
+    return messages, times
 
 def match_categories(summaries, categories):
+    """apply_categories for the [summaries] / [categories] lists the graph state uses."""
+    return apply_categories(summaries[0], categories[0])[0]
+
+
+def apply_categories(summaries, categories):
+    """
+    Copies the category fields from `categories` onto the summaries with the same id.
+
+    Answers are joined by id, so the order the LLM answered in does not matter.
+    Summaries the LLM left uncategorized are dropped, as are answers missing a
+    category field.
+
+    Returns:
+        tuple: (categorized summaries in summary order, id_join report)
+    """
+    pairs, report = id_join.join(summaries, categories)
     result = []
-    for i, elem in enumerate(summaries[0]):
-        if elem["id"] == categories[0][i]["id"]:
-            elem["primary_category"] = categories[0][i]["primary_category"]
-            elem["secondary_category"] = categories[0][i]["secondary_category"]
-            elem["tertiary_category"] = categories[0][i]["tertiary_category"]
-            print(i)
-            result.append(elem)
-    return result
+    for elem, category in pairs:
+        if not all(field in category for field in CATEGORY_FIELDS):
+            report["missing"].append(elem["id"])
+            continue
+        categorized = dict(elem)
+        for field in CATEGORY_FIELDS:
+            categorized[field] = category[field]
+        result.append(categorized)
+    if id_join.describe(report):
+        print(f"Categorization: {id_join.describe(report)}")
+    return result, report
+
+
+def parse_category(reply):
+    """
+    The category fields of one LLM category reply, or None if any is missing or empty.
+
+    Accepts the object itself, or the object wrapped in a one-item list or under
+    a single key (e.g. {"category": {...}}).
+    """
+    if isinstance(reply, list) and len(reply) == 1:
+        reply = reply[0]
+    if isinstance(reply, dict) and len(reply) == 1:
+        (inner,) = reply.values()
+        if isinstance(inner, dict):
+            reply = inner
+    if not isinstance(reply, dict):
+        return None
+    values = [reply.get(field) for field in CATEGORY_FIELDS]
+    if not all(isinstance(value, str) and value.strip() for value in values):
+        return None
+    return {field: value.strip() for field, value in zip(CATEGORY_FIELDS, values)}
+
+
+def taxonomy_paths(categories):
+    """Sorted distinct "primary > secondary > tertiary" paths of categorized summaries."""
+    return sorted(
+        {
+            f"{elem['primary_category']} > {elem['secondary_category']} > "
+            f"{elem['tertiary_category']}"
+            for elem in categories
+        }
+    )
 
 
 def group_by_category_level(categories_list):
@@ -39,25 +113,5 @@ def group_by_category_level(categories_list):
     Returns:
         dict: A nested dictionary organized by primary, secondary, and tertiary categories
     """
-    result = {}
-    
-    for category in categories_list:
-        primary = category["primary_category"]
-        secondary = category["secondary_category"]
-        tertiary = category["tertiary_category"]
-        
-        # Initialize primary category if it doesn't exist
-        if primary not in result:
-            result[primary] = {}
-        
-        # Initialize secondary category if it doesn't exist
-        if secondary not in result[primary]:
-            result[primary][secondary] = {}
-        
-        # Add message ID to the tertiary category
-        if tertiary not in result[primary][secondary]:
-            result[primary][secondary][tertiary] = []
-        
-        result[primary][secondary][tertiary].append(category["id"])
-    
-    return result
+    # For counts and sentiment rollups use the CategoryIndex directly
+    return CategoryIndex(categories_list).tree()
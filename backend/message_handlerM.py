@@ -1,38 +1,54 @@
-
-import json
+import math
 from typing import List
 
+from backend.utils import complaint_reader, dedup
+from backend.utils.category_index import CategoryIndex
+from backend.utils.complaint_record import ComplaintRecord
+from backend.utils.complaint_times import ComplaintTimes
+
+
+def read_messages(filepath: str, dedup_threshold: float = dedup.DEFAULT_THRESHOLD) -> List[ComplaintRecord]:
+    """
+    Reads all complaints from the export (JSON, JSONL, CSV or Parquet).
+
+    Records are parsed one at a time, so only the messages are held in memory,
+    each as a slotted ComplaintRecord. The start and end times are parsed in one
+    vectorized pass and each record gets its handling time in minutes.
 
-def read_messages(filepath: str) -> List[dict]:
-    """Reads all complaints from the JSON file."""
+    Near-duplicate dialogs are marked with "duplicate_of" pointing at the id of
+    the complaint that represents their group.
+    """
     try:
-        with open(filepath, encoding='utf-8') as file:
-            data = json.load(file)
-            
-            messages = []
-            for item in data:
-                try:
-                    # Make sure the ID is being preserved correctly
-                    message = {
-                        "id": item["DialogID"],  # This should be the original DialogID from the JSON
-                        "Customer Complaint Dialog": item["CustomerComplaintDialog"],
-                        "date_created": item.get("DateCreated", ""),
-                        "time_created": item.get("Date&TimeCreated", ""),
-                        "date_ended": item.get("DateEnded", ""),
-                        "time_ended": item.get("Date&TimeEnded", ""),
-                        "original_complaint": item["CustomerComplaintDialog"]
-                    }
-                    messages.append(message)
-                except KeyError as e:
-                    print(f"Warning: Skipping item due to missing data: {e}")
-                    continue
+        messages = []
+        # Rows without an id or dialog are skipped (and counted) by the reader
+        for item in complaint_reader.iter_complaints(filepath):
+            messages.append(ComplaintRecord(
+                item["DialogID"],  # This should be the original DialogID from the export
+                item["CustomerComplaintDialog"],
+                date_created=item["DateCreated"],
+                time_created=item["Date&TimeCreated"],
+                date_ended=item["DateEnded"],
+                time_ended=item["Date&TimeEnded"],
+            ))
                 
         if not messages:
-            raise ValueError("No valid messages were read from the JSON file")
+            raise ValueError("No valid messages were read from the complaint file")
+
+        times = ComplaintTimes(
+            [message.id for message in messages],
+            [message.date_created for message in messages],
+            [message.time_created for message in messages],
+            [message.date_ended for message in messages],
+            [message.time_ended for message in messages],
+        )
+        for message, minutes in zip(messages, times.minutes.tolist()):
+            message.handling_minutes = None if math.isnan(minutes) else round(minutes, 2)
             
-        return messages
+        return dedup.mark_duplicates(
+            messages, "Customer Complaint Dialog", threshold=dedup_threshold
+        )
     except Exception as e:
-        print(f"Error reading JSON file: {e}")
+        print(f"Error reading complaint file: {e}")
         # Return an empty list instead of None to prevent further errors
         return []
 
@@ -64,25 +80,5 @@ def group_by_category_level(categories_list):
     Returns:
         dict: A nested dictionary organized by primary, secondary, and tertiary categories
     """
-    result = {}
-    
-    for category in categories_list:
-        primary = category["primary_category"]
-        secondary = category["secondary_category"]
-        tertiary = category["tertiary_category"]
-        
-        # Initialize primary category if it doesn't exist
-        if primary not in result:
-            result[primary] = {}
-        
-        # Initialize secondary category if it doesn't exist
-        if secondary not in result[primary]:
-            result[primary][secondary] = {}
-        
-        # Add message ID to the tertiary category
-        if tertiary not in result[primary][secondary]:
-            result[primary][secondary][tertiary] = []
-        
-        result[primary][secondary][tertiary].append(category["id"])
-    
-    return result
+    # For counts and sentiment rollups use the CategoryIndex directly
+    return CategoryIndex(categories_list).tree()
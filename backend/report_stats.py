@@ -0,0 +1,172 @@
+import json
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Summaries per category/subcategory passed to the LLM as narrative context
+TOP_K_SUMMARIES = 5
+
+
+def categories_frame(categories: List[dict]) -> pd.DataFrame:
+    """
+    Categorized messages as a DataFrame with a numeric sentiment_score column.
+
+    Messages without a category are dropped; a sentiment that isn't numeric is
+    kept as NaN, so the message still counts toward its category.
+    """
+    df = pd.DataFrame(
+        categories,
+        columns=["id", "primary_category", "secondary_category", "summary", "sentiment_score"],
+    )
+    df["sentiment_score"] = pd.to_numeric(df["sentiment_score"], errors="coerce")
+    df["summary"] = df["summary"].fillna("").astype(str)
+    return df.dropna(subset=["primary_category", "secondary_category"])
+
+
+def _sample_summaries(group: pd.DataFrame, top_k: int) -> List[str]:
+    """Up to top_k summaries spread evenly across the group's sentiment range."""
+    ordered = group.sort_values("sentiment_score")["summary"].tolist()
+    if len(ordered) <= top_k:
+        return ordered
+    positions = np.linspace(0, len(ordered) - 1, top_k).round().astype(int)
+    return [ordered[i] for i in positions]
+
+
+def _score(value) -> Optional[float]:
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def _message(df: pd.DataFrame, row) -> dict:
+    if pd.isna(row):
+        return {"summary": "", "sentiment_score": None}
+    return {"summary": df.at[row, "summary"], "sentiment_score": _score(df.at[row, "sentiment_score"])}
+
+
+def compute_category_stats(categories: List[dict], top_k: int = TOP_K_SUMMARIES) -> List[dict]:
+    """
+    Per-category sentiment statistics computed with pandas group-bys.
+
+    Returns one entry per primary category, in the shape of the report's
+    "categories" list minus the narrative fields, plus sample_summaries for the LLM.
+
+    message_count covers every categorized message, like the CategoryIndex counts
+    in the dashboards; messages without a numeric sentiment are only left out of
+    the sentiment statistics, which are None for a group without any.
+    """
+    df = categories_frame(categories)
+    if df.empty:
+        return []
+
+    scored = df.dropna(subset=["sentiment_score"])
+    primary = pd.concat(
+        [
+            df.groupby("primary_category", sort=False).size().rename("count"),
+            scored.groupby("primary_category", sort=False)["sentiment_score"].agg(
+                ["mean", "idxmax", "idxmin"]
+            ),
+        ],
+        axis=1,
+    )
+    secondary = pd.concat(
+        [
+            df.groupby(["primary_category", "secondary_category"], sort=False)
+            .size()
+            .rename("count"),
+            scored.groupby(["primary_category", "secondary_category"], sort=False)[
+                "sentiment_score"
+            ].agg(["mean", "min", "max"]),
+        ],
+        axis=1,
+    )
+
+    stats = []
+    for name, row in primary.iterrows():
+        members = df[df["primary_category"] == name]
+        subcategories = []
+        for (_, sub_name), sub_row in secondary.loc[[name]].iterrows():
+            sub_members = members[members["secondary_category"] == sub_name]
+            subcategories.append(
+                {
+                    "category_level_2": sub_name,
+                    "message_count": int(sub_row["count"]),
+                    "average_sentiment_score": _score(sub_row["mean"]),
+                    "sentiment_range": {
+                        "lowest": _score(sub_row["min"]),
+                        "highest": _score(sub_row["max"]),
+                    },
+                    "sample_summaries": _sample_summaries(sub_members, top_k),
+                }
+            )
+        stats.append(
+            {
+                "category_level_1": name,
+                "message_count": int(row["count"]),
+                "average_sentiment_score": _score(row["mean"]),
+                "highest_sentiment_message": _message(df, row["idxmax"]),
+                "lowest_sentiment_message": _message(df, row["idxmin"]),
+                "sample_summaries": _sample_summaries(members, top_k),
+                "subcategories": subcategories,
+            }
+        )
+    return stats
+
+
+def build_digest(category_stats: dict) -> str:
+    """Compact JSON digest of one category's stats for the narrative prompt."""
+    return json.dumps(category_stats, ensure_ascii=False, separators=(",", ":"))
+
+
+def parse_narrative(reply) -> Optional[dict]:
+    """
+    The narrative object of one category report reply, or None if there is none.
+
+    Accepts the object itself, or the object wrapped in a one-item list, under
+    "categories" as a one-item list, or under a single key (e.g. {"category": {...}}).
+    """
+    if isinstance(reply, list) and len(reply) == 1:
+        reply = reply[0]
+    if isinstance(reply, dict) and len(reply) == 1:
+        ((key, inner),) = reply.items()
+        if key == "categories" and isinstance(inner, list) and len(inner) == 1:
+            inner = inner[0]
+        if isinstance(inner, dict):
+            reply = inner
+    return reply if isinstance(reply, dict) else None
+
+
+def merge_narrative(category_stats: dict, narrative: dict) -> dict:
+    """
+    Combines locally computed stats with the LLM's narrative fields for one category.
+
+    Numbers always come from the stats; the LLM only contributes summary,
+    key_insights and the subcategory summaries/trends.
+    """
+    sub_narratives = {
+        sub.get("category_level_2"): sub
+        for sub in narrative.get("subcategories", [])
+        if isinstance(sub, dict)
+    }
+    subcategories = []
+    for sub in category_stats["subcategories"]:
+        sub_narrative = sub_narratives.get(sub["category_level_2"], {})
+        subcategories.append(
+            {
+                "category_level_2": sub["category_level_2"],
+                "summary": sub_narrative.get("summary", ""),
+                "message_count": sub["message_count"],
+                "average_sentiment_score": sub["average_sentiment_score"],
+                "sentiment_range": sub["sentiment_range"],
+                "notable_sentiment_trends": sub_narrative.get("notable_sentiment_trends", []),
+            }
+        )
+    return {
+        "category_level_1": category_stats["category_level_1"],
+        "summary": narrative.get("summary", ""),
+        "message_count": category_stats["message_count"],
+        "average_sentiment_score": category_stats["average_sentiment_score"],
+        "highest_sentiment_message": category_stats["highest_sentiment_message"],
+        "lowest_sentiment_message": category_stats["lowest_sentiment_message"],
+        "key_insights": narrative.get("key_insights", []),
+        "subcategories": subcategories,
+    }
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import time
+from typing import Iterator, List
+
+import backend.utils.config as config
+
+
+def put(records: List, directory: str = config.ARTIFACT_DIR) -> dict:
+    """
+    Writes records to a content-addressed JSONL file and returns a small reference.
+
+    Identical record lists map to the same file, so rewriting one only refreshes
+    its modification time, which prune() treats as its last use.
+    """
+    lines = "".join(
+        json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records
+    ).encode("utf-8")
+    digest = hashlib.sha256(lines).hexdigest()
+    path = os.path.join(directory, f"{digest}.jsonl")
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(lines)
+        os.replace(temp_path, path)
+    return {"artifact": digest, "count": len(records)}
+
+
+def prune(
+    directory: str = config.ARTIFACT_DIR,
+    max_age: int = config.ARTIFACT_MAX_AGE_SECONDS,
+    max_count: int = config.ARTIFACT_MAX_COUNT,
+) -> int:
+    """
+    Deletes artifacts not written for max_age seconds, then the oldest ones
+    beyond max_count; returns how many were deleted.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".jsonl", ".tmp")):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    entries.sort(reverse=True)
+    cutoff = time.time() - max_age
+    removed = 0
+    kept = 0
+    for mtime, path in entries:
+        # Temporary files are never kept; once old enough they are leftovers of a crash
+        if mtime >= cutoff and (path.endswith(".tmp") or kept < max_count):
+            kept += not path.endswith(".tmp")
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def is_ref(value) -> bool:
+    return isinstance(value, dict) and "artifact" in value and "count" in value
+
+
+def iter_records(ref: dict, directory: str = config.ARTIFACT_DIR) -> Iterator:
+    """Streams the records behind a reference one line at a time."""
+    with open(os.path.join(directory, f"{ref['artifact']}.jsonl"), encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def get(ref, directory: str = config.ARTIFACT_DIR) -> List:
+    """Loads the records behind a reference; an empty or missing reference gives []."""
+    if not is_ref(ref):
+        return []
+    return list(iter_records(ref, directory))
+
+
+def resolve(value, nested: bool = False):
+    """
+    Replaces a reference with its records for display or output; other values pass through.
+
+    With nested=True the records come back wrapped in a one-element list, which is
+    the shape messages_info had before it moved out of the graph state.
+    """
+    if not is_ref(value):
+        return value
+    records = get(value)
+    return [records] if nested else records
@@ -0,0 +1,131 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+LEVELS = ("primary_category", "secondary_category", "tertiary_category")
+
+
+class CategoryIndex:
+    """
+    Categorized messages with their category labels stored as integer codes.
+
+    Each level keeps its labels once (in order of first appearance) and the
+    messages as a (n, 3) code matrix plus id and sentiment arrays, so counts,
+    sentiment statistics and drill-down selections at any level are NumPy
+    operations over the arrays instead of walks over nested dicts. A path is a
+    tuple of labels from the primary level down, e.g. ("Product", "Refrigerator").
+    """
+
+    def __init__(self, categories: List[dict]):
+        self.labels = [[] for _ in LEVELS]
+        lookups = [{} for _ in LEVELS]
+        codes = np.empty((len(categories), len(LEVELS)), dtype=np.int32)
+        for row, category in enumerate(categories):
+            for level, field in enumerate(LEVELS):
+                label = category.get(field)
+                code = lookups[level].get(label)
+                if code is None:
+                    code = lookups[level][label] = len(self.labels[level])
+                    self.labels[level].append(label)
+                codes[row, level] = code
+        self._lookups = lookups
+        self.codes = codes
+        self.ids = np.array([category.get("id") for category in categories], dtype=object)
+        sentiment = [category.get("sentiment_score") for category in categories]
+        self.sentiment = np.array(
+            [_to_float(value) for value in sentiment], dtype=np.float64
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, path: Sequence[str] = ()) -> np.ndarray:
+        """Boolean mask of the messages under path (every message for an empty path)."""
+        selected = np.ones(len(self), dtype=bool)
+        for level, label in enumerate(path):
+            code = self._lookups[level].get(label)
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            selected &= self.codes[:, level] == code
+        return selected
+
+    def select(self, path: Sequence[str] = (), lowest=None, highest=None) -> np.ndarray:
+        """Ids of the messages under path, optionally within a sentiment range."""
+        selected = self.mask(path)
+        if lowest is not None:
+            selected &= self.sentiment >= lowest
+        if highest is not None:
+            selected &= self.sentiment <= highest
+        return self.ids[selected]
+
+    def rollup(self, level: int, path: Sequence[str] = ()) -> List[dict]:
+        """
+        Message count and sentiment mean/min/max per category at level (0-2)
+        below path, in order of first appearance.
+
+        Messages without a numeric sentiment score are counted but left out of
+        the sentiment statistics, which are None for a group without any.
+        """
+        rows = np.flatnonzero(self.mask(path))
+        if not len(rows):
+            return []
+        # One integer key per distinct path down to level
+        sizes = [len(labels) for labels in self.labels[: level + 1]]
+        keys = np.ravel_multi_index(tuple(self.codes[rows, : level + 1].T), sizes)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1))
+        counts = np.diff(np.append(starts, len(order)))
+
+        scores = self.sentiment[rows][order]
+        valid = ~np.isnan(scores)
+        scored = np.add.reduceat(valid.astype(np.int64), starts)
+        totals = np.add.reduceat(np.where(valid, scores, 0.0), starts)
+        lowest = np.minimum.reduceat(np.where(valid, scores, np.inf), starts)
+        highest = np.maximum.reduceat(np.where(valid, scores, -np.inf), starts)
+
+        # Stable sort: the first row of each group is its first appearance
+        first_rows = rows[order][starts]
+        groups = []
+        for i in np.argsort(first_rows, kind="stable"):
+            group_path = tuple(
+                self.labels[lv][code]
+                for lv, code in enumerate(self.codes[first_rows[i], : level + 1])
+            )
+            groups.append(
+                {
+                    "path": group_path,
+                    "count": int(counts[i]),
+                    "mean": float(totals[i] / scored[i]) if scored[i] else None,
+                    "min": float(lowest[i]) if scored[i] else None,
+                    "max": float(highest[i]) if scored[i] else None,
+                }
+            )
+        return groups
+
+    def tree(self) -> Dict:
+        """Nested {primary: {secondary: {tertiary: [ids]}}} dict, in order of first appearance."""
+        result = {}
+        if not len(self):
+            return result
+        keys = np.ravel_multi_index(
+            tuple(self.codes.T), [len(labels) for labels in self.labels]
+        )
+        order = np.argsort(keys, kind="stable")
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys[order])) + 1))
+        groups = np.split(order, starts[1:])
+        for members in sorted(groups, key=lambda members: members[0]):
+            primary, secondary, tertiary = (
+                self.labels[level][code] for level, code in enumerate(self.codes[members[0]])
+            )
+            result.setdefault(primary, {}).setdefault(secondary, {})[tertiary] = (
+                self.ids[members].tolist()
+            )
+        return result
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,76 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row so dot products become cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def choose_k(n_items: int, max_clusters: int) -> int:
+    """Rule-of-thumb cluster count sqrt(n/2), capped by max_clusters."""
+    if n_items == 0:
+        return 0
+    return max(1, min(max_clusters, n_items, round(math.sqrt(n_items / 2))))
+
+
+def kmeans(
+    vectors, k: int, iterations: int = 50, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means with k-means++ seeding, fully vectorized over the data.
+
+    Args:
+        vectors: (n, d) array-like of embeddings
+        k (int): Number of clusters
+        iterations (int): Maximum Lloyd iterations
+        seed (int): Seed for the k-means++ initialization
+
+    Returns:
+        tuple: (labels of shape (n,), unit-norm centroids of shape (k, d))
+    """
+    data = normalize(np.asarray(vectors, dtype=np.float32))
+    n = data.shape[0]
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+
+    centroids = np.empty((k, data.shape[1]), dtype=np.float32)
+    centroids[0] = data[rng.integers(n)]
+    distance = 1.0 - data @ centroids[0]
+    for i in range(1, k):
+        weights = np.clip(distance, 0.0, None)
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[i] = data[index]
+        distance = np.minimum(distance, 1.0 - data @ centroids[i])
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = np.argmax(data @ centroids.T, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=k)
+        # An emptied cluster keeps its previous centroid
+        filled = counts > 0
+        centroids[filled] = normalize(sums[filled])
+    return labels, centroids
+
+
+def representatives(
+    vectors, labels: np.ndarray, centroids: np.ndarray, per_cluster: int
+) -> List[List[int]]:
+    """Indices of the members closest to each centroid, most central first."""
+    data = normalize(np.asarray(vectors, dtype=np.float32))
+    similarity = np.einsum("ij,ij->i", data, centroids[labels])
+    result = []
+    for cluster in range(len(centroids)):
+        members = np.flatnonzero(labels == cluster)
+        order = np.argsort(-similarity[members])[:per_cluster]
+        result.append(members[order].tolist())
+    return result
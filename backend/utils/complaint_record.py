@@ -0,0 +1,134 @@
+import sys
+
+# Message keys sent to the LLM, and the slot holding each
+_MESSAGE_KEYS = {
+    "id": "id",
+    "Customer Complaint Dialog": "dialog",
+}
+# Complaint times, kept locally and joined into the output only
+_TIME_KEYS = ("date_created", "time_created", "date_ended", "time_ended", "handling_minutes")
+# Result fields with their own slot; anything else the LLM returns goes to extra
+_RESULT_KEYS = ("summary", "sentiment_score", "assigned_category")
+
+
+class ComplaintRecord:
+    """
+    One complaint and the results computed for it, without a per-record dict.
+
+    Records are read like the message dicts they replace (record["id"],
+    record.get("Customer Complaint Dialog"), "duplicate_of" in record), so dedup,
+    sharding and the result store work on them unchanged, and repr() is the
+    message dict the prompts contain: id and dialog only, as the dates and the
+    handling time are joined back in locally. Category names are interned, so a
+    million records share one string per category. Convert with to_dict() where
+    records are written out as JSON.
+    """
+
+    __slots__ = (
+        "id",
+        "dialog",
+        "date_created",
+        "time_created",
+        "date_ended",
+        "time_ended",
+        "handling_minutes",
+        "duplicate_of",
+        "summary",
+        "sentiment_score",
+        "assigned_category",
+        "extra",
+    )
+
+    def __init__(self, id, dialog, date_created="", time_created="", date_ended="", time_ended=""):
+        self.id = id
+        self.dialog = dialog
+        self.date_created = date_created
+        self.time_created = time_created
+        self.date_ended = date_ended
+        self.time_ended = time_ended
+        self.handling_minutes = None
+        self.duplicate_of = None
+        self.summary = None
+        self.sentiment_score = None
+        self.assigned_category = None
+        self.extra = None
+
+    def __getitem__(self, key):
+        if key == "duplicate_of" and self.duplicate_of is not None:
+            return self.duplicate_of
+        if key not in _MESSAGE_KEYS:
+            raise KeyError(key)
+        return getattr(self, _MESSAGE_KEYS[key])
+
+    def __setitem__(self, key, value):
+        # Only dedup.mark_duplicates writes to records through the mapping interface
+        if key != "duplicate_of":
+            raise KeyError(key)
+        self.duplicate_of = value
+
+    def __contains__(self, key):
+        if key == "duplicate_of":
+            return self.duplicate_of is not None
+        return key in _MESSAGE_KEYS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def message(self):
+        """The complaint as a message dict, as sent to the LLM"""
+        return {key: getattr(self, slot) for key, slot in _MESSAGE_KEYS.items()}
+
+    def __repr__(self):
+        return repr(self.message())
+
+    def apply(self, result):
+        """Copy an LLM result onto the record; the record's own id, dialog and dates are kept"""
+        for key, value in result.items():
+            if key in _MESSAGE_KEYS or key in _TIME_KEYS or key == "duplicate_of":
+                continue
+            if key == "assigned_category" and isinstance(value, str):
+                value = sys.intern(value)
+            if key in _RESULT_KEYS:
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def to_dict(self):
+        """The record as written to artifacts and output files"""
+        output = {"id": self.id}
+        for key in _RESULT_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                output[key] = value
+        if self.extra:
+            output.update(self.extra)
+        for key in _TIME_KEYS:
+            output[key] = getattr(self, key)
+        if self.duplicate_of is not None:
+            output["duplicate_of"] = self.duplicate_of
+        return output
+
+
+def attach_results(records, results):
+    """
+    Applies each result to its record, matched by id; near-duplicates get their
+    representative's result. Returns the records that received a result, in order.
+    """
+    by_id = {}
+    for result in results:
+        if isinstance(result, dict) and "id" in result:
+            by_id.setdefault(str(result["id"]), result)
+    matched = []
+    for record in records:
+        source = record.id if record.duplicate_of is None else record.duplicate_of
+        result = by_id.get(str(source))
+        if result is None:
+            continue
+        record.apply(result)
+        matched.append(record)
+    return matched
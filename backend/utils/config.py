@@ -40,4 +40,32 @@ GENERATE_MODEL_COHERE = "cohere.command-r-plus-08-2024"
 
 # LLAMA data
 PROVIDER_LLAMA="meta"
-GENERATE_MODEL_LLAMA_33 = "ocid1.generativeaimodel.oc1.eu-frankfurt-1.amaaaaaask7dceya4tdabclcsqbc3yj2mozvvqoq5ccmliv3354hfu3mx6bq"
\ No newline at end of file
+GENERATE_MODEL_LLAMA_33 = "ocid1.generativeaimodel.oc1.eu-frankfurt-1.amaaaaaask7dceya4tdabclcsqbc3yj2mozvvqoq5ccmliv3354hfu3mx6bq"
+
+# Complaint export read by the agents; JSON, JSONL, CSV or Parquet (see complaint_reader)
+COMPLAINTS_PATH = "backend/data/ComplainsList.json"
+
+# LLM response cache
+LLM_CACHE_PATH = "backend/data/cache/llm_cache.sqlite"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Per-DialogID stage results, reused across runs for unchanged complaints
+RESULT_STORE_PATH = "backend/data/cache/results.sqlite"
+
+# Local embedding store (one memory-mapped matrix per embedding model)
+EMBEDDING_STORE_DIR = "backend/data/cache/embeddings"
+EMBEDDING_STORE_QUANTIZE = False
+
+# Near-duplicate complaint detection (MinHash estimated Jaccard similarity)
+DEDUP_THRESHOLD = 0.8
+
+# LangGraph checkpoints, one thread per run so failed runs can be resumed
+CHECKPOINT_DB_PATH = "backend/data/cache/checkpoints.sqlite"
+
+# Content-hashed JSONL artifacts; graph state only carries references to them.
+# Artifacts unused for ARTIFACT_MAX_AGE_SECONDS, and the oldest beyond
+# ARTIFACT_MAX_COUNT, are deleted when an agent starts; runs that old can't be resumed
+ARTIFACT_DIR = "backend/data/cache/artifacts"
+ARTIFACT_MAX_AGE_SECONDS = 7 * 24 * 3600
+ARTIFACT_MAX_COUNT = 1000
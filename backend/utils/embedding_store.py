@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk embedding matrix read through numpy.memmap.
+
+    Layout of `directory`:
+        meta.json     dimension and storage dtype
+        vectors.bin   row-major float32 (or int8 when quantized) vectors
+        scales.bin    per-row float32 scale factors, only when quantized
+        index.jsonl   one {"id", "hash", "row"} line per appended vector
+
+    Rows are never rewritten; re-embedding a changed text appends a new row and
+    the latest index line for an id wins. Reads map the file instead of loading
+    it, so the matrix can be much larger than memory.
+
+    Vectors are appended before their index lines, so the row count comes from
+    the size of vectors.bin. After a crash between the two writes, the orphan
+    rows are kept but unindexed, and a partially written row, scale or index
+    line is truncated when the store is opened.
+    """
+
+    def __init__(self, directory: str, quantize: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        self._scales_path = os.path.join(directory, "scales.bin")
+        self._index_path = os.path.join(directory, "index.jsonl")
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            self.dim = meta["dim"]
+            self.quantize = meta["dtype"] == "int8"
+        else:
+            self.dim = None
+            self.quantize = quantize
+
+        self._index: Dict[str, Tuple[str, int]] = {}
+        self._rows = self._recover()
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as file:
+                for line in file:
+                    entry = json.loads(line)
+                    if entry["row"] < self._rows:
+                        self._index[entry["id"]] = (entry["hash"], entry["row"])
+        self._mapped = None
+
+    def _recover(self) -> int:
+        """
+        Number of complete rows on disk. Truncates a partial vector or scale at
+        the end of the data files and a partial last line of the index.
+        """
+        rows = 0
+        if self.dim is not None and os.path.exists(self._vectors_path):
+            row_bytes = self.dim * np.dtype(self.dtype).itemsize
+            rows = os.path.getsize(self._vectors_path) // row_bytes
+            if self.quantize:
+                scale_rows = (
+                    os.path.getsize(self._scales_path) // 4
+                    if os.path.exists(self._scales_path)
+                    else 0
+                )
+                rows = min(rows, scale_rows)
+                _truncate(self._scales_path, rows * 4)
+            _truncate(self._vectors_path, rows * row_bytes)
+        if os.path.exists(self._index_path):
+            _truncate(self._index_path, _complete_lines_size(self._index_path))
+        return rows
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def dtype(self):
+        return np.int8 if self.quantize else np.float32
+
+    def lookup(self, key: str, digest: str) -> Optional[int]:
+        """Row holding the vector for `key`, if it was embedded from content with this hash."""
+        entry = self._index.get(str(key))
+        if entry and entry[0] == digest:
+            return entry[1]
+        return None
+
+    def add(self, keys: List[str], digests: List[str], vectors) -> List[int]:
+        """Appends vectors and indexes them under keys; returns their row numbers."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) == 0:
+            return []
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as file:
+                    json.dump(
+                        {"dim": self.dim, "dtype": np.dtype(self.dtype).name}, file
+                    )
+            if vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}"
+                )
+
+            if self.quantize:
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                stored = np.round(vectors / scales[:, None]).astype(np.int8)
+                with open(self._scales_path, "ab") as file:
+                    scales.astype(np.float32).tofile(file)
+            else:
+                stored = vectors
+            with open(self._vectors_path, "ab") as file:
+                stored.tofile(file)
+
+            rows = list(range(self._rows, self._rows + len(vectors)))
+            with open(self._index_path, "a", encoding="utf-8") as file:
+                for key, digest, row in zip(keys, digests, rows):
+                    file.write(json.dumps({"id": str(key), "hash": digest, "row": row}) + "\n")
+                    self._index[str(key)] = (digest, row)
+            self._rows += len(vectors)
+            self._mapped = None
+        return rows
+
+    def matrix(self) -> np.ndarray:
+        """Zero-copy, read-only view of all stored rows (int8 codes when quantized)."""
+        if self._rows == 0:
+            return np.empty((0, self.dim or 0), dtype=self.dtype)
+        if self._mapped is None or len(self._mapped) != self._rows:
+            self._mapped = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dim)
+            )
+        return self._mapped
+
+    def get(self, rows: List[int]) -> np.ndarray:
+        """float32 vectors for the given rows; only those rows are read from disk."""
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.asarray(self.matrix()[rows], dtype=np.float32)
+        if self.quantize:
+            scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(self._rows,))
+            vectors *= scales[rows][:, None]
+        return vectors
+
+
+def _complete_lines_size(path: str, block: int = 4096) -> int:
+    """Bytes up to and including the last newline; only the tail of the file is read."""
+    with open(path, "rb") as file:
+        end = file.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - block)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _truncate(path: str, size: int):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as file:
+            file.truncate(size)
+
+
+def embed_with_store(store: EmbeddingStore, keys: List[str], texts: List[str], embed) -> np.ndarray:
+    """
+    Returns float32 vectors for texts, calling `embed` only for keys that are new
+    or whose text changed since they were stored.
+    """
+    digests = [content_hash(text) for text in texts]
+    rows = [store.lookup(key, digest) for key, digest in zip(keys, digests)]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        new_rows = store.add(
+            [keys[i] for i in missing],
+            [digests[i] for i in missing],
+            embed([texts[i] for i in missing]),
+        )
+        for i, row in zip(missing, new_rows):
+            rows[i] = row
+    if not rows:
+        return np.empty((0, store.dim or 0), dtype=np.float32)
+    return store.get(rows)
@@ -0,0 +1,66 @@
+"""
+Joining LLM output back to the source records by DialogID.
+
+The source records are indexed by id once, so merging a response is linear in
+the number of records whatever order the model answered in. Ids are compared as
+strings because models echo numeric ids as text and the other way round. Every
+join reports which source ids got no answer (to re-request just those), which
+answers carry an id that was not asked for, and which ids were answered more
+than once (the first answer is kept).
+
+The same module is used by the Streamlit backend (backend/utils) and the
+BackEnd scripts (ReacTypescriptAPP/BackEnd/utils); keep the two copies identical
+(check_shared_utils.py at the repository root compares them).
+"""
+
+
+def index(records, key="id"):
+    """Dict of str(record[key]) -> record, in record order; the first record per id wins"""
+    by_id = {}
+    for record in records:
+        by_id.setdefault(str(record[key]), record)
+    return by_id
+
+
+def join(sources, outputs, source_key="id", output_key="id"):
+    """
+    Pair each source record with the output that has the same id.
+
+    Outputs that are not objects or have no id count as extra (with id None).
+
+    Returns:
+        tuple: (list of (source, output) pairs in source order,
+               report dict with "missing", "extra" and "duplicate" id lists)
+    """
+    by_id = index(sources, source_key)
+    answers = {}
+    extra = []
+    duplicate = []
+    for output in outputs if isinstance(outputs, list) else []:
+        output_id = output.get(output_key) if isinstance(output, dict) else None
+        if output_id is None or str(output_id) not in by_id:
+            extra.append(output_id)
+        elif str(output_id) in answers:
+            duplicate.append(output_id)
+        else:
+            answers[str(output_id)] = output
+
+    pairs = []
+    missing = []
+    for key, source in by_id.items():
+        if key in answers:
+            pairs.append((source, answers[key]))
+        else:
+            missing.append(source[source_key])
+    return pairs, {"missing": missing, "extra": extra, "duplicate": duplicate}
+
+
+def describe(report):
+    """One-line summary of a join report for logs, or "" if every id matched exactly once"""
+    parts = [
+        f"{len(report[name])} {name} ({', '.join(str(i) for i in report[name][:10])}"
+        f"{', ...' if len(report[name]) > 10 else ''})"
+        for name in ("missing", "extra", "duplicate")
+        if report[name]
+    ]
+    return ", ".join(parts)
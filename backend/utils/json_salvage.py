@@ -0,0 +1,221 @@
+"""
+Tolerant parsing of JSON embedded in LLM completions.
+
+The outermost JSON array or object is pulled out of surrounding prose and
+markdown fences in a single linear scan that also repairs common defects:
+trailing commas, raw newlines/tabs inside strings and truncation. A truncated
+response keeps every element that was complete and drops the partial one; the
+open containers are closed after the last complete value.
+
+The same module is used by the Streamlit backend (backend/utils) and the
+BackEnd scripts (ReacTypescriptAPP/BackEnd/utils); keep the two copies identical
+(check_shared_utils.py at the repository root compares them).
+"""
+import json
+
+# Opening brackets tried as the start of the JSON value before giving up
+MAX_CANDIDATES = 8
+
+_CLOSERS = {"[": "]", "{": "}"}
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _scan(text, start):
+    """
+    Repair the JSON value starting at text[start] (an opening bracket).
+
+    Returns:
+        tuple: (repaired JSON text or None if nothing complete was found,
+               True if the text ended before the value was closed)
+    """
+    out = []
+    stack = []
+    # One flag per open object: True while the next string is a key
+    expect_key = []
+    in_string = False
+    escaped = False
+    string_is_key = False
+    # Objects open below the outermost container; while any is open, the element
+    # being written is incomplete and nothing inside it may be kept on truncation
+    nested_objects = 0
+    # Latest point where the output so far is a complete prefix, and the stack there
+    safe_len = None
+    safe_stack = ()
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+                out.append(ch)
+            elif ch == "\\":
+                escaped = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+                if not string_is_key and not nested_objects:
+                    safe_len, safe_stack = len(out), tuple(stack)
+            else:
+                out.append(_STRING_ESCAPES.get(ch, ch))
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == "{" and expect_key[-1]
+            out.append(ch)
+        elif ch in _CLOSERS:
+            if ch == "{":
+                expect_key.append(True)
+                if stack:
+                    nested_objects += 1
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "]}":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                # Mismatched closer: this is not the JSON value
+                return None, False
+            # Drop a trailing comma before the closer
+            end = len(out)
+            while end and out[end - 1].isspace():
+                end -= 1
+            if end and out[end - 1] == ",":
+                del out[end - 1]
+            if stack.pop() == "{":
+                expect_key.pop()
+                if stack:
+                    nested_objects -= 1
+            out.append(ch)
+            if not stack:
+                return "".join(out), False
+            if not nested_objects:
+                safe_len, safe_stack = len(out), tuple(stack)
+        elif ch == ",":
+            if stack and not nested_objects and out and out[-1] not in "[{,":
+                safe_len, safe_stack = len(out), tuple(stack)
+            if stack and stack[-1] == "{":
+                expect_key[-1] = True
+            out.append(ch)
+        elif ch == ":":
+            if stack and stack[-1] == "{":
+                expect_key[-1] = False
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if safe_len is None:
+        return None, True
+    closing = "".join(_CLOSERS[opener] for opener in reversed(safe_stack))
+    return "".join(out[:safe_len]) + closing, True
+
+
+def salvage(text):
+    """
+    Parse the outermost JSON array/object in text, repairing it where needed.
+
+    Returns:
+        tuple: (parsed value, True if the value was recovered from truncated output)
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be recovered
+    """
+    if not isinstance(text, str):
+        raise json.JSONDecodeError("Expected a string", str(text), 0)
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    position = 0
+    for _ in range(MAX_CANDIDATES):
+        starts = [index for index in (text.find("[", position), text.find("{", position)) if index != -1]
+        if not starts:
+            break
+        start = min(starts)
+        repaired, truncated = _scan(text, start)
+        if repaired is None and truncated:
+            # Every later bracket lies inside this unfinished value
+            break
+        if repaired is not None:
+            try:
+                return json.loads(repaired), truncated
+            except json.JSONDecodeError:
+                pass
+        position = start + 1
+    raise json.JSONDecodeError("No JSON value could be recovered", text, 0)
+
+
+def loads(text):
+    """Drop-in replacement for json.loads on LLM output; see salvage()."""
+    return salvage(text)[0]
+
+
+class ArrayStream:
+    """
+    Incremental parser for the first JSON array in a streamed completion.
+
+    feed() takes the next chunk of text and returns the array elements completed
+    by it, so records can be used while the model is still generating. Text
+    before the opening bracket is ignored. Each character is scanned once.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element = None
+        self.finished = False
+
+    def feed(self, chunk):
+        elements = []
+        for ch in chunk:
+            if self.finished:
+                break
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+                continue
+
+            if self._depth == 1:
+                if ch in ",]":
+                    # A primitive element ends at the delimiter
+                    self._emit(elements)
+                    if ch == "]":
+                        self._depth = 0
+                        self.finished = True
+                    continue
+                if ch.isspace() and not self._buffer:
+                    continue
+
+            self._buffer.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._emit(elements)
+        return elements
+
+    def _emit(self, elements):
+        text = "".join(self._buffer).strip()
+        self._buffer = []
+        if not text:
+            return
+        try:
+            elements.append(loads(text))
+        except json.JSONDecodeError:
+            # A malformed element is skipped; the caller can re-request missing records
+            pass
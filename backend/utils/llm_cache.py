@@ -0,0 +1,179 @@
+# Shared by backend/utils and ReacTypescriptAPP/BackEnd/utils; keep the two copies
+# identical (check_shared_utils.py at the repository root compares them).
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def make_key(model_id: str, model_kwargs: dict, prompt, payload=None) -> str:
+    """Content address of an LLM request: hash of model, sampling settings, prompt and input."""
+    blob = json.dumps(
+        [model_id, model_kwargs, prompt, payload],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed cache of LLM completions, stored in a single SQLite file.
+
+    Entries expire after `ttl` seconds, and the least recently used entries are
+    evicted once the stored responses exceed `max_bytes`.
+
+    The total size is kept in a one-row table maintained by triggers, so checking
+    it costs the same however large the cache is, and stays right when several
+    processes share the file. Hits don't write: their access times are collected
+    in memory and written in batches of TOUCH_BATCH, and before any eviction.
+    """
+
+    # Access times held in memory before they are written
+    TOUCH_BATCH = 64
+
+    def __init__(self, path: str, ttl: int, max_bytes: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # One transaction, so a process writing meanwhile can't be counted twice
+        # by both the seeded total and the triggers
+        self._conn.executescript(
+            "BEGIN IMMEDIATE;"
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);"
+            "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at);"
+            "CREATE TABLE IF NOT EXISTS total_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO total_size (id, bytes)"
+            " SELECT 0, COALESCE(SUM(size), 0) FROM responses;"
+            "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN"
+            " UPDATE total_size SET bytes = bytes + NEW.size WHERE id = 0; END;"
+            "CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN"
+            " UPDATE total_size SET bytes = bytes - OLD.size WHERE id = 0; END;"
+            "CREATE TRIGGER IF NOT EXISTS responses_resize AFTER UPDATE OF size ON responses BEGIN"
+            " UPDATE total_size SET bytes = bytes - OLD.size + NEW.size WHERE id = 0; END;"
+            "COMMIT;"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the rows REPLACE deletes
+            # don't fire the delete trigger
+            self._conn.execute(
+                "INSERT INTO responses (key, value, size, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " created_at = excluded.created_at, last_access = excluded.last_access",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._touched.pop(key, None)
+            self._evict(now)
+            self._conn.commit()
+
+    def flush(self):
+        """Writes the access times of recent hits."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._total_size()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT bytes FROM total_size WHERE id = 0").fetchone()[0]
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        )
+        total = self._total_size()
+        if total <= self.max_bytes:
+            return
+        # Least recently used is only accurate with the pending access times written
+        self._flush_touched()
+        stale = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ):
+            stale.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: str, ttl: int, max_bytes: int) -> LLMCache:
+    """Returns the shared cache for `path`, opening it on first use."""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = LLMCache(path, ttl, max_bytes)
+        return _caches[path]
@@ -23,6 +23,15 @@ MODEL_REGISTRY = {
         "auth_profile": config.CONFIG_PROFILE,
         "model_kwargs": {"temperature": 0, "max_tokens": 4000},
         "embedding_model": config.EMBEDDING_MODEL_COHERE,
+        # Input tokens per summarization shard, sized so each shard's response fits max_tokens
+        "shard_token_budget": 3000,
+        "max_concurrency": 4,
+        # Embedding-based categorization (categ_with_embedding=True)
+        "embedding_batch_size": 96,
+        "max_clusters": 12,
+        "cluster_examples": 5,
+        # Micro-batches buffered between stages in run_pipelined (backpressure bound)
+        "pipeline_queue_size": 2,
     },
     "meta_oci": {
         "model_id": config.GENERATE_MODEL_LLAMA_33,
@@ -32,6 +41,9 @@ MODEL_REGISTRY = {
         "auth_type": config.AUTH_TYPE,
         "auth_profile": config.CONFIG_PROFILE,
         "model_kwargs": {"temperature": 0, "max_tokens": 2000},
+        "shard_token_budget": 1500,
+        "max_concurrency": 4,
+        "pipeline_queue_size": 2,
     },
 }
 
@@ -40,6 +52,8 @@ PROMPT_SETS = {
         "SUMMARIZATION": prompts.SUMMARIZATION,
         "CATEGORIZATION_SYSTEM": prompts.CATEGORIZATION_SYSTEM,
         "CATEGORIZATION_USER": prompts.CATEGORIZATION_USER,
+        "CATEGORIZATION_FIXED_SYSTEM": prompts.CATEGORIZATION_FIXED_SYSTEM,
+        "CLUSTER_LABELING": prompts.CLUSTER_LABELING,
         "REPORT_GEN": prompts.REPORT_GEN,
     },
     "meta_oci": {
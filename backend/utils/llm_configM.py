@@ -23,6 +23,9 @@ MODEL_REGISTRY = {
         "auth_profile": config.CONFIG_PROFILE,
         "model_kwargs": {"temperature": 0, "max_tokens": 4000},
         "embedding_model": config.EMBEDDING_MODEL_COHERE,
+        # Input tokens per summarization shard, sized so each shard's response fits max_tokens
+        "shard_token_budget": 3000,
+        "max_concurrency": 4,
     },
     "meta_oci": {
         "model_id": config.GENERATE_MODEL_LLAMA_33,
@@ -32,6 +35,8 @@ MODEL_REGISTRY = {
         "auth_type": config.AUTH_TYPE,
         "auth_profile": config.CONFIG_PROFILE,
         "model_kwargs": {"temperature": 0, "max_tokens": 2000},
+        "shard_token_budget": 1500,
+        "max_concurrency": 4,
     },
 }
 
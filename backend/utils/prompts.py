@@ -86,53 +86,65 @@ Message Batch:
 \
 """
 
+CATEGORIZATION_FIXED_SYSTEM = """\
+You are an expert content analyzer that categorizes user messages into an EXISTING hierarchical taxonomy. You process batches of message summaries, each with a unique ID, and assign each one to a category path from the taxonomy below.
+
+IMPORTANT CONSTRAINTS:
+- Use ONLY the category paths listed in the taxonomy; do not create, rename or merge categories
+- Pick the closest path when no path fits perfectly
+- Categorize every message in the batch exactly once
+
+Taxonomy (one "primary > secondary > tertiary" path per line):
+{TAXONOMY}
+
+Return your analysis as a JSON array with each element containing "id", "primary_category", "secondary_category", and "tertiary_category".
+\
+"""
+
+CLUSTER_LABELING = """\
+You are an expert content analyzer. The message summaries below were grouped together because they are semantically similar. Name the group with a 3-level hierarchical category:
+
+1. Primary category: Broadest level (e.g., "Human Resources", "Finance", "IT")
+2. Secondary category: More specific domain within the primary category (e.g., "Policies", "Benefits", "Recruitment")
+3. Tertiary category: Most specific classification (e.g., "Leaves", "Health Insurance", "Interview Process")
+
+Prefer short, reusable names. Return ONLY a JSON object in this exact format:
+{
+  "primary_category": "Primary level category",
+  "secondary_category": "Secondary level category within primary",
+  "tertiary_category": "Tertiary level category within secondary"
+}
+\
+"""
+
 REPORT_GEN = """\
-# **Generate a Categorized JSON Report of Messages**
+# **Write the Narrative for One Category of a Message Report**
 
 ## **Task**  
-You are an expert data analyst. Your task is to generate a structured and insightful JSON report analyzing a batch of messages based on their category levels, summaries, and sentiment scores. Each message is classified into three hierarchical category levels (Category Level 2 and Category Level 3).  
+You are an expert data analyst. You receive the digest of ONE category from a batch of messages. The sentiment statistics (message counts, averages, highest/lowest messages and ranges, on a scale where 1=extremely negative and 10=extremely positive) have already been computed exactly, together with a sample of message summaries for the category and each of its subcategories.
 
 ## **Instructions**  
-Follow these steps to generate the report:  
-1. **Group messages by Category Level 2**, then further organize them into Category Level 3 subcategories.  
-2. **Summarize each category level** by aggregating key themes and trends from message summaries.  
-3. **Analyze sentiment scores** by calculating the average, highest, and lowest sentiment scores for each category level (1=extremely negative, 10=extremely positive). 
-4. **Identify key insights** such as common concerns, prevailing sentiment trends, and outliers.  
-5. **Format the output as a structured JSON object** with the following structure:  
+1. **Do NOT recompute or restate any numbers**; they are added to the report separately.  
+2. **Summarize the category** (category_level_1) by aggregating key themes and trends from its sample summaries.  
+3. **Identify key insights** such as common concerns, prevailing sentiment trends, and outliers.  
+4. **Summarize each subcategory** (category_level_2) and list its notable sentiment trends.  
+5. Use the category and subcategory names exactly as given in the digest.  
 
 ## **Output Format (JSON)**  
 {
-  "categories": [
+  "category_level_1": "Category Name",
+  "summary": "Concise summary of messages in this category",
+  "key_insights": [
+    "Notable pattern 1",
+    "Notable pattern 2"
+  ],
+  "subcategories": [
     {
-      "category_level_1": "Category Name",
-      "summary": "Concise summary of messages in this category",
-      "average_sentiment_score": 7.2,
-      "highest_sentiment_message": {
-        "summary": "Message summary",
-        "sentiment_score": 10
-      },
-      "lowest_sentiment_message": {
-        "summary": "Message summary",
-        "sentiment_score": 2
-      },
-      "key_insights": [
-        "Notable pattern 1",
-        "Notable pattern 2"
-      ],
-      "subcategories": [
-        {
-          "category_level_2": "Subcategory Name",
-          "summary": "Common themes from messages",
-          "average_sentiment_score": 6.5,
-          "sentiment_range": {
-            "lowest": 3,
-            "highest": 9
-          },
-          "notable_sentiment_trends": [
-            "Trend 1",
-            "Trend 2"
-          ],
-        }
+      "category_level_2": "Subcategory Name",
+      "summary": "Common themes from messages",
+      "notable_sentiment_trends": [
+        "Trend 1",
+        "Trend 2"
       ]
     }
   ]
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+DIALOG_KEY = "Customer Complaint Dialog"
+# Ids per lookup query, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def namespace(model_id: str, prompt: str) -> str:
+    """Namespace of results computed by one model with one system prompt."""
+    return f"{model_id}:{text_hash(prompt)}"
+
+
+class ResultStore:
+    """
+    Per-DialogID results of a pipeline stage, stored in SQLite together with the
+    hash of the dialog text they were computed from.
+
+    Results are kept per namespace (see namespace()), so switching the model or
+    editing the prompt does not reuse results produced by the old one. A run only
+    needs to send complaints whose id is new or whose text changed.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(results)")]
+        if columns and "namespace" not in columns:
+            # Results stored before namespaces can't be attributed to a model or prompt
+            self._conn.execute("DROP TABLE results")
+        # The primary key index serves the (stage, namespace, dialog_id) lookups
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " stage TEXT NOT NULL,"
+            " namespace TEXT NOT NULL,"
+            " dialog_id TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (stage, namespace, dialog_id))"
+        )
+        self._conn.commit()
+
+    def partition(
+        self, stage: str, namespace: str, messages: List[dict]
+    ) -> Tuple[Dict[str, dict], List[dict]]:
+        """
+        Splits messages into results stored under namespace (keyed by id) and
+        messages that still need processing. Only the ids of `messages` are looked up.
+        """
+        ids = list(dict.fromkeys(str(message["id"]) for message in messages))
+        known = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT dialog_id, text_hash, result FROM results"
+                    " WHERE stage = ? AND namespace = ?"
+                    f" AND dialog_id IN ({','.join('?' * len(chunk))})",
+                    (stage, namespace, *chunk),
+                ).fetchall()
+                known.update((dialog_id, (digest, result)) for dialog_id, digest, result in rows)
+
+        stored = {}
+        pending = []
+        for message in messages:
+            dialog_id = str(message["id"])
+            entry = known.get(dialog_id)
+            if entry and entry[0] == text_hash(message.get(DIALOG_KEY, "")):
+                stored[dialog_id] = json.loads(entry[1])
+            else:
+                pending.append(message)
+        return stored, pending
+
+    def save(self, stage: str, namespace: str, messages: List[dict], results: List[dict]):
+        """Stores the results that belong to one of `messages`, matched by id."""
+        hashes = {
+            str(message["id"]): text_hash(message.get(DIALOG_KEY, ""))
+            for message in messages
+        }
+        now = time.time()
+        rows = [
+            (stage, namespace, str(result["id"]), hashes[str(result["id"])], json.dumps(result), now)
+            for result in results
+            if isinstance(result, dict) and str(result.get("id")) in hashes
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results"
+                " (stage, namespace, dialog_id, text_hash, result, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+
+def merge_results(messages: List[dict], stored: Dict[str, dict], fresh: List[dict]) -> List[dict]:
+    """Combines stored and freshly computed results in the order of the source messages."""
+    source_ids = {str(message["id"]) for message in messages}
+    combined = dict(stored)
+    extras = []
+    for result in fresh:
+        if isinstance(result, dict) and str(result.get("id")) in source_ids:
+            combined[str(result["id"])] = result
+        else:
+            extras.append(result)
+    ordered = [
+        combined[str(message["id"])]
+        for message in messages
+        if str(message["id"]) in combined
+    ]
+    return ordered + extras
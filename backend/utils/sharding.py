@@ -0,0 +1,56 @@
+import json
+from typing import List
+
+from backend.utils import json_salvage
+
+# Rough characters-per-token ratio for the Cohere/Llama tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(item) -> int:
+    """Cheap token estimate for a message dict or string, without calling a tokenizer."""
+    if isinstance(item, str):
+        text = item
+    else:
+        text = json.dumps(item, ensure_ascii=False, default=str)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def shard_messages(messages: List, token_budget: int) -> List[List]:
+    """
+    Splits messages into consecutive shards whose estimated size stays under token_budget.
+
+    A single message larger than the budget still gets its own shard.
+    """
+    shards = []
+    current = []
+    used = 0
+    for message in messages:
+        cost = estimate_tokens(message)
+        if current and used + cost > token_budget:
+            shards.append(current)
+            current = []
+            used = 0
+        current.append(message)
+        used += cost
+    if current:
+        shards.append(current)
+    return shards
+
+
+def merge_json_arrays(contents: List[str]) -> List:
+    """
+    Parses each shard response and concatenates the resulting JSON arrays.
+
+    Responses are parsed with json_salvage, so prose around the JSON and a
+    truncated tail do not lose the complete records. A shard that answers with a
+    single object instead of an array contributes that object.
+    """
+    merged = []
+    for content in contents:
+        parsed = json_salvage.loads(content)
+        if isinstance(parsed, list):
+            merged.extend(parsed)
+        else:
+            merged.append(parsed)
+    return merged
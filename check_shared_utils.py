@@ -0,0 +1,50 @@
+"""
+Fails when the utils modules shared by the two apps have drifted apart.
+
+The Streamlit backend (backend/utils) and the BackEnd scripts
+(ReacTypescriptAPP/BackEnd/utils) are deployed separately, so each carries its
+own copy of these modules. Run this after editing either copy:
+
+    python check_shared_utils.py
+
+It prints a diff of every pair that differs and exits with status 1.
+"""
+import difflib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TREES = ("backend/utils", "ReacTypescriptAPP/BackEnd/utils")
+SHARED = (
+    "llm_cache.py",
+    "dedup.py",
+    "json_salvage.py",
+    "complaint_reader.py",
+    "id_join.py",
+    "complaint_times.py",
+)
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.readlines()
+
+
+def main():
+    drifted = []
+    for name in SHARED:
+        left, right = (os.path.join(tree, name) for tree in TREES)
+        left_lines = read_lines(os.path.join(ROOT, left))
+        right_lines = read_lines(os.path.join(ROOT, right))
+        if left_lines != right_lines:
+            drifted.append(name)
+            sys.stdout.writelines(difflib.unified_diff(left_lines, right_lines, left, right))
+    if drifted:
+        print(f"Shared utils modules differ: {', '.join(drifted)}", file=sys.stderr)
+        return 1
+    print(f"{len(SHARED)} shared utils modules are identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,38 +2,43 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import time
 from backend.utils import llm_configM as llm_config
 from backend.utils.promptsM import SUMMARIZATION
 import plotly.express as px
 from backend.feedback_wrapperM import FeedbackAgentWrapperM
+from backend.utils import complaint_times
 
 st.set_page_config(page_title="AI Analysis", layout="wide")
 
-def load_complaints():
-    """Load complaints from JSON file and convert to DataFrame"""
-    try:
-        with open("backend/data/ComplainsList.json", encoding='utf-8') as file:
-            data = json.load(file)
-        
-        # Convert JSON to DataFrame
-        df = pd.DataFrame(data)
-        return df
-    except Exception as e:
-        st.error(f"Error loading complaints: {e}")
-        return pd.DataFrame()
-
-def process_complaints(complaints_df):
-    # Initialize the FeedbackAgentM wrapper
-    agent = FeedbackAgentWrapperM()
+def process_complaints(resume_run_id=None, live_results=None):
+    # Initialize the FeedbackAgentM wrapper: streaming summaries into the
+    # live_results placeholder when given, otherwise running the checkpointed
+    # graph, continuing a failed run if requested
+    streaming = live_results is not None
+    agent = FeedbackAgentWrapperM(
+        run_id=resume_run_id, resume=resume_run_id is not None, stream=streaming
+    )
+    st.session_state['run_id'] = agent.run_id
     
     # Process the complaints step by step
     step_outputs = {}
     current_step = None
+    streamed = []
+    total = len(agent.agent.messages)
+    last_redraw = 0.0
     
-    print("Starting complaint processing...")
+    print(f"Starting complaint processing (run {agent.run_id})...")
     
     while current_step != "FINALIZED":
-        next_step, output = agent.run_step_by_step()
+        try:
+            next_step, output = agent.run_step_by_step()
+        except Exception:
+            # The completed steps are checkpointed; remember the run so it can be resumed.
+            # Streaming runs aren't, but their stored summaries are reused by a rerun
+            if not streaming:
+                st.session_state['failed_run_id'] = agent.run_id
+            raise
         print(f"Processing step: {next_step}")
         if output:
             step_outputs[next_step] = output
@@ -41,8 +46,17 @@ def process_complaints(complaints_df):
             print(f"Step: {next_step}, Output keys: {list(output.keys())}")
         else:
             print(f"No output for step: {next_step}")
+        if streaming and next_step == "summarize" and output:
+            streamed.extend(output["summarize"]["messages_info"][0])
+            # Redraw at most a few times a second; the table is rebuilt on every redraw
+            if time.monotonic() - last_redraw > 0.3 or len(streamed) >= total:
+                show_live_results(live_results, streamed, total)
+                last_redraw = time.monotonic()
         current_step = next_step
     
+    if streaming:
+        live_results.empty()
+    
     print(f"Final step_outputs: {step_outputs.keys()}")
     
     # Save results to output.json file
@@ -51,6 +65,13 @@ def process_complaints(complaints_df):
     # Return the raw step_outputs for display
     return step_outputs
 
+def show_live_results(placeholder, records, total):
+    """Redraws the placeholder with the complaints summarized so far"""
+    with placeholder.container():
+        st.progress(min(len(records) / total, 1.0) if total else 0.0)
+        st.caption(f"{len(records)} of {total} complaints summarized")
+        st.dataframe(pd.DataFrame(records), use_container_width=True)
+
 def save_results_to_json(step_outputs):
     """Save analysis results to output.json file"""
     results = None
@@ -154,7 +175,9 @@ def display_json_results(step_outputs):
             results = extract_results_from_step_outputs(step_outputs)
     
     # Create tabs for different views
-    tab1, tab2, tab3, tab4 = st.tabs(["Table View", "Formatted View", "Raw JSON", "Report Text"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Table View", "Formatted View", "Raw JSON", "Report Text", "Resolution Times"]
+    )
     
     # Display results in different formats
     if results:
@@ -201,6 +224,10 @@ def display_json_results(step_outputs):
                                 
                                 st.markdown("**Date & Time Ended:**")
                                 st.write(f"{item.get('date_ended', '')} {item.get('time_ended', '')}")
+
+                                if item.get('handling_minutes') is not None:
+                                    st.markdown("**Handling Time:**")
+                                    st.write(f"{item['handling_minutes']:g} min")
             elif isinstance(results, dict) and "categories" in results:
                 # Display categories in a more readable format
                 for category in results["categories"]:
@@ -264,6 +291,42 @@ def display_json_results(step_outputs):
         else:
             st.warning("No report text available. Please run the analysis first.")
 
+    with tab5:
+        display_resolution_times(results)
+
+def display_resolution_times(results):
+    """Complaints and handling time per day and per category, computed locally from the dates"""
+    records = [item for item in results if isinstance(item, dict)] if isinstance(results, list) else []
+    if not records:
+        st.warning("Resolution times need the per-complaint results. Please run the analysis first.")
+        return
+    times = complaint_times.ComplaintTimes.from_records(
+        records, id_key="id", fields=complaint_times.OUTPUT_FIELDS
+    )
+
+    daily = pd.DataFrame(times.daily())
+    if not daily.empty:
+        fig = px.line(
+            daily,
+            x="date",
+            y="mean_minutes",
+            markers=True,
+            hover_data=["count", "median_minutes", "max_minutes"],
+            labels={"date": "Day Created", "mean_minutes": "Average Handling Time (min)"},
+            title="Handling Time per Day",
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(daily, use_container_width=True)
+
+    categorized = [item for item in records if item.get("assigned_category")]
+    if categorized:
+        st.markdown("**Handling Time per Category**")
+        by_category = times.by_category(
+            [item["id"] for item in categorized],
+            [item["assigned_category"] for item in categorized],
+        )
+        st.dataframe(pd.DataFrame(by_category), use_container_width=True)
+
 def extract_results_from_step_outputs(step_outputs):
     """Helper function to extract results from step_outputs"""
     if not step_outputs:
@@ -288,17 +351,36 @@ def extract_results_from_step_outputs(step_outputs):
 def main():
     st.title("🤖 AI Complaint Analysis Dashboard")
     
-    # Load complaints
-    complaints_df = load_complaints()
-    
     # Check if output.json exists and show a message
     if os.path.exists("backend/data/output.json"):
         st.info("Previous analysis results are available. You can run a new analysis or view the existing results.")
     
-    if st.button("Start AI Analysis"):
+    failed_run_id = st.session_state.get('failed_run_id')
+    resume_clicked = failed_run_id is not None and st.button("Resume Failed Analysis")
+    stream_results = st.checkbox(
+        "Show results as they arrive",
+        value=True,
+        help="Streams each summary as the model writes it. Streamed runs can't be resumed, "
+        "but a rerun reuses the summaries already stored.",
+    )
+    
+    if st.button("Start AI Analysis") or resume_clicked:
+        streaming = stream_results and not resume_clicked
+        live_results = st.empty() if streaming else None
         with st.spinner("Analyzing complaints..."):
             # Process complaints through AI analysis
-            step_outputs = process_complaints(complaints_df)
+            try:
+                step_outputs = process_complaints(
+                    resume_run_id=failed_run_id if resume_clicked else None,
+                    live_results=live_results,
+                )
+            except Exception as e:
+                if streaming:
+                    st.error(f"Analysis failed: {e}. Summaries completed so far were stored and are reused by the next run.")
+                else:
+                    st.error(f"Analysis failed: {e}. Completed steps were saved and can be resumed.")
+                return
+            st.session_state.pop('failed_run_id', None)
             st.session_state['step_outputs'] = step_outputs
             st.success("Analysis complete!")
             
@@ -4,6 +4,7 @@ import streamlit as st
 import plotly.express as px
 
 from backend.feedback_wrapper import FeedbackAgentWrapper
+from backend.utils.category_index import CategoryIndex
 
 
 def create_flowchart(nodes, edges, highlight_node=None, highlight_edge=None, label=""):
@@ -34,9 +35,18 @@ def find_result(data):
     return None
 
 
+def find_categories(data):
+    for value_list in data.values():
+        for subdict in value_list:
+            if isinstance(subdict, dict) and "categorize" in subdict:
+                return subdict["categorize"].get("categories")
+    return None
+
+
 def execute_flow(col1, col2):
     competitor_report = FeedbackAgentWrapper()
     steps, edges = competitor_report.get_nodes_edges()
+    st.session_state.complaint_times = competitor_report.agent.times
 
     i = 0
     current_step = steps[0]
@@ -102,7 +112,9 @@ def display_category(data):
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.metric("📊 Avg Sentiment Score", category["average_sentiment_score"])
-                st.progress(category["average_sentiment_score"] / 5)
+                # None when no message in the category has a numeric score
+                if category["average_sentiment_score"] is not None:
+                    st.progress(category["average_sentiment_score"] / 5)
             with col2:
                 st.success(
                     f"💚 Highest Sentiment: {category['highest_sentiment_message']['sentiment_score']}"
@@ -195,6 +207,54 @@ def display_sentiment(steps_data):
         with st.expander(f"📌 {row['topic']} (Sentiment: {row['sentiment_score']})"):
             st.write(row["summary"])
 
+def display_drilldown(index, times=None):
+    st.subheader("🔎 Category Drill-down")
+
+    # Narrow the path one level at a time; "All" stops at the level above
+    path = []
+    cols = st.columns(3)
+    for level, name in enumerate(["Primary", "Secondary", "Tertiary"]):
+        options = [group["path"][-1] for group in index.rollup(level, path)]
+        with cols[level]:
+            choice = st.selectbox(f"{name} category", ["All"] + options, key=f"drilldown_{level}")
+        if choice == "All":
+            break
+        path.append(choice)
+
+    rows = []
+    for group in index.rollup(min(len(path), 2), path):
+        rows.append({
+            "category": " > ".join(str(label) for label in group["path"]),
+            "messages": group["count"],
+            "avg_sentiment": group["mean"],
+            "lowest": group["min"],
+            "highest": group["max"],
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+    lowest, highest = st.slider("Sentiment range", 1.0, 10.0, (1.0, 10.0), step=0.5)
+    ids = index.select(path, lowest=lowest, highest=highest)
+    st.write(f"{len(ids)} messages: {', '.join(str(i) for i in ids[:100])}{' ...' if len(ids) > 100 else ''}")
+
+    if times is None or not len(ids):
+        return
+    st.markdown("### ⏱️ Handling Time")
+    level = min(len(path), 2)
+    mask = index.mask(path) & (index.sentiment >= lowest) & (index.sentiment <= highest)
+    labels = [index.labels[level][code] for code in index.codes[mask, level]]
+    st.dataframe(pd.DataFrame(times.by_category(index.ids[mask], labels)), use_container_width=True)
+    daily = pd.DataFrame(times.daily(ids))
+    if not daily.empty:
+        fig = px.bar(
+            daily,
+            x="date",
+            y="count",
+            hover_data=["mean_minutes", "median_minutes", "max_minutes"],
+            labels={"date": "Day Created", "count": "Complaints"},
+            title="Complaints per Day",
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
 # ---------------------------
 # 🧠 MAIN APP LOGIC
 # ---------------------------
@@ -213,6 +273,9 @@ if start_button and st.session_state.flow_completed:
     st.session_state.flow_completed = False
     step_outputs = execute_flow(col1, col2)
     feedback_result = find_result(step_outputs)
+    categorized = find_categories(step_outputs)
+    # Kept across reruns so the drill-down widgets can query it
+    st.session_state.category_index = CategoryIndex(categorized) if categorized else None
 
     st.divider()
 
@@ -226,3 +289,7 @@ if start_button and st.session_state.flow_completed:
             st.error("🚫 Failed to parse feedback results. Please check the output format.")
     else:
         st.warning("⚠️ No feedback results were found in the flow.")
+
+if st.session_state.get("category_index") is not None:
+    st.divider()
+    display_drilldown(st.session_state.category_index, st.session_state.get("complaint_times"))